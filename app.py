@@ -9,7 +9,7 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
-def scrape_google_maps(url, progress_callback=None):
+def create_driver():
     # Configurar as opções do Chrome
     options = webdriver.ChromeOptions()
     options.add_argument("--headless")  # Executar em modo headless (sem interface gráfica)
@@ -21,12 +21,28 @@ def scrape_google_maps(url, progress_callback=None):
     # Instanciar o WebDriver do Chrome utilizando o gerenciador nativo do Selenium
     # Se falhar, o Selenium tentará baixar o driver adequado automaticamente.
     try:
-        driver = webdriver.Chrome(options=options)
+        return webdriver.Chrome(options=options)
     except Exception as e:
         print(f"Erro ao inicializar o ChromeDriver: {e}")
         # Tentar novamente forçando o serviço se necessário (geralmente não precisa na v4.40+)
         raise e
 
+def is_cancelled(cancel_event):
+    return cancel_event is not None and cancel_event.is_set()
+
+def pause(seconds, cancel_event=None):
+    # Espera interrompível: retorna True se a busca foi cancelada durante a pausa
+    if cancel_event is None:
+        time.sleep(seconds)
+        return False
+    return cancel_event.wait(seconds)
+
+def scrape_google_maps(url, progress_callback=None, driver=None, cancel_event=None):
+    # Reutilizar o navegador recebido (ex: lote de buscas) ou abrir um próprio
+    owns_driver = driver is None
+    if owns_driver:
+        driver = create_driver()
+
     try:
         # Abrir a URL
         driver.get(url)
@@ -47,7 +63,9 @@ def scrape_google_maps(url, progress_callback=None):
                 var el = arguments[0];
                 el.scrollTop = el.scrollHeight;
             """, scrollable)
-            time.sleep(2)
+            if pause(2, cancel_event):
+                print("Busca cancelada durante o carregamento da lista.")
+                return []
 
             # Verificar se chegamos ao final da lista checando o texto do feed
             try:
@@ -66,7 +84,9 @@ def scrape_google_maps(url, progress_callback=None):
                     var el = arguments[0];
                     el.scrollBy(0, 500);
                 """, scrollable)
-                time.sleep(2)
+                if pause(2, cancel_event):
+                    print("Busca cancelada durante o carregamento da lista.")
+                    return []
             else:
                 retries = 0
                 previous_count = current_count
@@ -79,13 +99,21 @@ def scrape_google_maps(url, progress_callback=None):
         print(f"Total de empresas encontradas: {total}")
 
         for i in range(total):
+            # Ponto de cancelamento: devolver apenas as empresas já extraídas
+            if is_cancelled(cancel_event):
+                print(f"Busca cancelada após {len(results)}/{total} empresas.")
+                break
+
             # Re-localizar elementos e re-rolar se necessário para garantir que o item i existe
             business_elements = driver.find_elements(By.CSS_SELECTOR, "a.hfpxzc")
-            while len(business_elements) <= i:
+            while len(business_elements) <= i and not is_cancelled(cancel_event):
                 scrollable = driver.find_element(By.CSS_SELECTOR, "div[role='feed']")
                 driver.execute_script("arguments[0].scrollTop = arguments[0].scrollHeight", scrollable)
-                time.sleep(2)
+                pause(2, cancel_event)
                 business_elements = driver.find_elements(By.CSS_SELECTOR, "a.hfpxzc")
+            if is_cancelled(cancel_event):
+                print(f"Busca cancelada após {len(results)}/{total} empresas.")
+                break
             business = business_elements[i]
 
             name = "N/A"
@@ -101,9 +129,13 @@ def scrape_google_maps(url, progress_callback=None):
             try:
                 # Scroll o elemento para ficar visível antes de clicar
                 driver.execute_script("arguments[0].scrollIntoView({block: 'center'})", business)
-                time.sleep(1)
+                if pause(1, cancel_event):
+                    print(f"Busca cancelada após {len(results)}/{total} empresas.")
+                    break
                 business.click()
-                time.sleep(3)
+                if pause(3, cancel_event):
+                    print(f"Busca cancelada após {len(results)}/{total} empresas.")
+                    break
 
                 try:
                     address = driver.find_element(By.CSS_SELECTOR, "[data-item-id='address']").text.replace("\n", "")
@@ -142,7 +174,9 @@ def scrape_google_maps(url, progress_callback=None):
                     back_btn.click()
                 except:
                     driver.back()
-                time.sleep(2)
+                if pause(2, cancel_event):
+                    print(f"Busca cancelada após {len(results)}/{total} empresas.")
+                    break
 
                 # Aguardar a lista de resultados reaparecer
                 wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div[role='feed']")))
@@ -168,8 +202,9 @@ def scrape_google_maps(url, progress_callback=None):
         return results
 
     finally:
-        # Fechar o navegador
-        driver.quit()
+        # Fechar o navegador somente se foi aberto por esta função
+        if owns_driver:
+            driver.quit()
 
 def save_to_csv(data, filename="output.csv"):
     # Criar um DataFrame a partir dos dados extraídos
@@ -0,0 +1,242 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from queue import Queue, Empty
+from urllib.parse import quote
+
+import pandas as pd
+
+from app import create_driver, scrape_google_maps, is_cancelled
+from busca import fetch_contacts, build_row
+from contacts import normalize_contacts
+from dedup import DuplicateTracker, cluster_records, merge_records
+
+BATCH_BROWSER_SESSIONS = 2
+ENRICH_WORKERS = 8
+
+
+def query_label(termo, cidade):
+    return f"{termo} em {cidade}"
+
+
+def search_url(termo, cidade):
+    return f"https://www.google.com/maps/search/{quote(query_label(termo, cidade))}"
+
+
+def _normalize(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)) or value == "N/A":
+        return ""
+    return re.sub(r"\s+", " ", str(value)).strip().lower()
+
+
+def scrape_queries(queries, sessions=BATCH_BROWSER_SESSIONS, on_business=None, on_query_done=None,
+                   cancel_event=None):
+    """Scrapes every (termo, cidade) over a few shared Chrome sessions.
+
+    Each session pulls the next query from a shared queue and reuses its
+    browser; a session whose query fails gets a fresh browser for the next one.
+    Once `cancel_event` is set, sessions stop taking queries and close their browser.
+    Returns (results_by_query, errors_by_query), both keyed by query index.
+    Raises RuntimeError if no session could start a browser at all.
+    """
+    pending = Queue()
+    for i in range(len(queries)):
+        pending.put(i)
+    results = {}
+    errors = {}
+    browsers_started = []
+    browser_errors = []
+
+    def session():
+        driver = None
+        try:
+            while not is_cancelled(cancel_event):
+                try:
+                    i = pending.get_nowait()
+                except Empty:
+                    return
+                termo, cidade = queries[i]
+
+                def callback(current, total, result=None, i=i):
+                    if on_business:
+                        on_business(i, current, total, result)
+
+                try:
+                    if driver is None:
+                        try:
+                            driver = create_driver()
+                        except Exception as e:
+                            browser_errors.append(e)
+                            raise
+                        browsers_started.append(True)
+                    results[i] = scrape_google_maps(search_url(termo, cidade), progress_callback=callback, driver=driver,
+                                                    cancel_event=cancel_event)
+                except Exception as e:
+                    errors[i] = str(e)
+                    results[i] = []
+                    if driver is not None:
+                        try:
+                            driver.quit()
+                        except Exception:
+                            pass
+                    driver = None
+                if on_query_done:
+                    on_query_done(i, results[i])
+        finally:
+            if driver is not None:
+                driver.quit()
+
+    threads = [threading.Thread(target=session, daemon=True) for _ in range(max(1, min(sessions, len(queries))))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if browser_errors and not browsers_started:
+        # Every query failed for the same reason: surface it instead of "no results"
+        raise RuntimeError(f"Não foi possível abrir o navegador: {browser_errors[0]}")
+    return results, errors
+
+
+def merge_queries(queries, results_by_query):
+    """Deduplicates businesses across queries (see dedup.cluster_records).
+
+    Returns (businesses, keys_by_query): `businesses` maps a cluster id to the
+    merged record plus the labels of every query that found it.
+    """
+    flat = [(i, result) for i in range(len(queries)) for result in results_by_query.get(i, [])]
+    roots = cluster_records([result for _, result in flat])
+
+    members = {}
+    keys_by_query = {i: [] for i in range(len(queries))}
+    for (i, result), root in zip(flat, roots):
+        members.setdefault(root, []).append((i, result))
+        # Per-query views keep the order in which that query found its businesses
+        if root not in keys_by_query[i]:
+            keys_by_query[i].append(root)
+
+    businesses = {}
+    for root in sorted(members):
+        labels = list(dict.fromkeys(query_label(*queries[i]) for i, _ in members[root]))
+        businesses[root] = {"record": merge_records([r for _, r in members[root]]), "queries": labels}
+    return businesses, keys_by_query
+
+
+def enrich_businesses(businesses, executor, progress_callback=None, cancel_event=None):
+    """Fetches contacts once per distinct website using the shared executor.
+
+    On cancellation, fetches that haven't started are dropped, the ones in
+    flight are abandoned, and their businesses keep "N/A" contacts. Returns
+    {cluster id: enriched row}.
+    """
+    futures = {}
+    submitted = set()
+    for entry in businesses.values():
+        url = entry["record"].get("URL", "N/A")
+        if _normalize(url) and url not in submitted:
+            submitted.add(url)
+            futures[executor.submit(fetch_contacts, url, entry["record"].get("Name", "N/A"), cancel_event)] = url
+
+    contacts_by_url = {}
+    total = len(futures)
+    not_done = set(futures)
+    while not_done:
+        done, not_done = wait(not_done, timeout=0.5, return_when=FIRST_COMPLETED)
+        for future in done:
+            if not future.cancelled():
+                contacts_by_url[futures[future]] = future.result()
+        if done and progress_callback:
+            progress_callback(len(contacts_by_url), total)
+        if is_cancelled(cancel_event):
+            # Fetches in flight see the cancel at their next chunk and are not waited for
+            for future in not_done:
+                future.cancel()
+            break
+
+    rows = {}
+    for key, entry in businesses.items():
+        record = entry["record"]
+        url = record.get("URL", "N/A")
+        contacts = contacts_by_url.get(url, ("N/A", "N/A", "N/A"))
+        rows[key] = build_row(record.get("Name", "N/A"), record.get("Full Address", "N/A"), url, contacts)
+    return rows
+
+
+def _sheet_name(index, label, used):
+    # Excel sheet names: max 31 chars, no []:*?/\ and unique (case-insensitive)
+    name = re.sub(r"[\[\]:*?/\\]", "_", f"{index + 1} {label}")[:31]
+    while name.lower() in used:
+        name = name[:28] + f"~{len(used)}"
+    used.add(name.lower())
+    return name
+
+
+def write_batch_output(output_file, queries, businesses, keys_by_query, rows):
+    """One workbook: a consolidated sheet of unique businesses plus one sheet per query."""
+    consolidated = pd.DataFrame(
+        [{**rows[key], "Consultas": " | ".join(entry["queries"])} for key, entry in businesses.items()]
+    )
+    used = {"consolidado"}
+    with pd.ExcelWriter(output_file) as writer:
+        consolidated.to_excel(writer, sheet_name="Consolidado", index=False)
+        for i, (termo, cidade) in enumerate(queries):
+            view = pd.DataFrame([rows[key] for key in keys_by_query.get(i, [])], columns=consolidated.columns[:-1])
+            view.to_excel(writer, sheet_name=_sheet_name(i, query_label(termo, cidade), used), index=False)
+
+
+def run_batch(queries, output_file, progress_callback=None, result_callback=None,
+              sessions=BATCH_BROWSER_SESSIONS, workers=ENRICH_WORKERS, cancel_event=None):
+    """Runs a list of (termo, cidade) queries as one job.
+
+    progress_callback(stage, current, total, message) reports batch-wide
+    progress; result_callback(result) receives each business the first time
+    any query finds it, matched with the same fuzzy rules as the consolidated
+    sheet (see dedup.DuplicateTracker). If `cancel_event` is set, whatever was scraped and
+    enriched so far is still written to `output_file`. Returns a summary dict
+    whose "places" are the deduplicated records, tagged with their queries.
+    """
+    lock = threading.Lock()
+    streamed = DuplicateTracker()
+    done_queries = []
+
+    def on_business(i, current, total, result):
+        if result is not None and result_callback:
+            with lock:
+                is_new = streamed.add(result)
+            if is_new:
+                result_callback(result)
+        if progress_callback:
+            with lock:
+                finished = len(done_queries)
+            progress_callback(1, finished, len(queries),
+                              f"Consulta '{query_label(*queries[i])}': empresa {current}/{total}")
+
+    def on_query_done(i, data):
+        with lock:
+            done_queries.append(i)
+            finished = len(done_queries)
+        if progress_callback:
+            progress_callback(1, finished, len(queries), f"Consultas concluídas {finished}/{len(queries)}")
+
+    results_by_query, errors = scrape_queries(queries, sessions, on_business, on_query_done, cancel_event)
+    businesses, keys_by_query = merge_queries(queries, results_by_query)
+    if not businesses:
+        return {"queries": len(queries), "businesses": 0, "errors": errors, "cancelled": is_cancelled(cancel_event)}
+
+    def stage2_callback(current, total):
+        if progress_callback:
+            progress_callback(2, current, total, f"Processando contatos {current}/{total}")
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        rows = enrich_businesses(businesses, executor, stage2_callback, cancel_event)
+    finally:
+        # After a cancel, don't block on downloads that are still winding down
+        executor.shutdown(wait=not is_cancelled(cancel_event), cancel_futures=True)
+
+    # One column-wise normalization pass over the whole batch
+    rows = normalize_contacts(pd.DataFrame.from_dict(rows, orient="index")).to_dict("index")
+
+    write_batch_output(output_file, queries, businesses, keys_by_query, rows)
+    places = [{**entry["record"], "query": " | ".join(entry["queries"])} for entry in businesses.values()]
+    return {"queries": len(queries), "businesses": len(businesses), "errors": errors,
+            "cancelled": is_cancelled(cancel_event), "places": places}
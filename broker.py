@@ -0,0 +1,322 @@
+import json
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+TASK_LEASE_SECONDS = 60
+TASK_MAX_ATTEMPTS = 3
+
+
+class JobBroker(ABC):
+    """Interface between the API process and scrape workers.
+
+    The API creates jobs and enqueues tasks; workers claim tasks under a
+    lease (renewed while they run, so a crashed worker's task is picked up
+    again), publish progress events and mark jobs finished. The API relays a
+    job's events to its SSE subscribers.
+    """
+
+    # ---------- Jobs ----------
+
+    @abstractmethod
+    def create_job(self, job_id, kind):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_job(self, job_id):
+        """Returns {"job_id", "kind", "status", "output_file", "cancelled"} or None."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_job(self, job_id, status=None, output_file=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def cancel(self, job_id):
+        """Flags the job. Queued tasks are dropped; if none is running, the job ends with a "cancelled" event."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def is_cancelled(self, job_id):
+        raise NotImplementedError
+
+    # ---------- Tasks ----------
+
+    @abstractmethod
+    def enqueue(self, job_id, kind, payload):
+        """Queues a task and returns its id."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim(self, worker_id, kinds, lease_seconds=TASK_LEASE_SECONDS):
+        """Atomically takes the oldest available task of one of `kinds`.
+
+        Returns {"task_id", "job_id", "kind", "payload", "attempts"} or None.
+        Tasks whose lease ran out on their last attempt are failed here and
+        their job ends with an "error" event.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def renew(self, task_id, lease_seconds=TASK_LEASE_SECONDS):
+        raise NotImplementedError
+
+    @abstractmethod
+    def complete(self, task_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def fail(self, task_id, error):
+        raise NotImplementedError
+
+    # ---------- Events ----------
+
+    @abstractmethod
+    def publish(self, job_id, event):
+        raise NotImplementedError
+
+    @abstractmethod
+    def events_after(self, job_id, after_id=0, limit=500):
+        """Returns [(event_id, event)] with event_id > after_id, oldest first."""
+        raise NotImplementedError
+
+
+class SQLiteBroker(JobBroker):
+    """JobBroker on a single SQLite file, for an API and workers on the same host (and for tests).
+
+    Every call opens its own connection, so an instance can be shared by
+    threads; WAL mode lets the API and several workers read and write at once.
+    WAL needs shared memory between the processes, so the file must be on a
+    local disk, not on a network filesystem: workers on other nodes need a
+    networked backend registered in BROKER_BACKENDS.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            output_file TEXT,
+            cancelled INTEGER NOT NULL DEFAULT 0,
+            created REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS tasks (
+            task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            worker_id TEXT,
+            lease_expires REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, kind, task_id);
+        CREATE TABLE IF NOT EXISTS events (
+            event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS events_job ON events (job_id, event_id);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit connection, closed after each operation
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent claims and cancels serialize
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _finish_job(self, conn, job_id, status, message):
+        """Ends a job no worker will report on: sets its status and publishes the terminal event."""
+        job = conn.execute("SELECT status, output_file FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if job is None or job["status"] != "running":
+            return
+        # Keep the stage/counters of the last progress event the job published
+        event = {"stage": 1, "current": 0, "total": 0}
+        for row in conn.execute("SELECT data FROM events WHERE job_id = ? ORDER BY event_id DESC LIMIT 50",
+                                (job_id,)):
+            last = json.loads(row["data"])
+            if "stage" in last:
+                event = {"stage": last["stage"], "current": last["current"], "total": last["total"]}
+                break
+        event.update(status=status, message=message)
+        if job["output_file"]:
+            event["output_file"] = job["output_file"]
+        conn.execute("UPDATE jobs SET status = ? WHERE job_id = ?", (status, job_id))
+        conn.execute("INSERT INTO events (job_id, data) VALUES (?, ?)", (job_id, json.dumps(event)))
+
+    def _finish_if_cancelled(self, conn, job_id):
+        """Publishes the "cancelled" event of a cancelled job once none of its tasks is queued or running."""
+        job = conn.execute("SELECT cancelled, output_file FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if job is None or not job["cancelled"]:
+            return
+        pending = conn.execute("SELECT 1 FROM tasks WHERE job_id = ? AND status IN ('queued', 'running')",
+                               (job_id,)).fetchone()
+        if pending is not None:
+            return
+        if job["output_file"]:
+            message = "Busca cancelada. Resultados parciais disponíveis para download."
+        else:
+            message = "Busca cancelada antes de qualquer resultado."
+        self._finish_job(conn, job_id, "cancelled", message)
+
+    def _fail_expired(self, conn, now):
+        """Fails tasks whose lease ran out on their last attempt, together with their jobs."""
+        rows = conn.execute(
+            "SELECT task_id, job_id FROM tasks WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+            (now, TASK_MAX_ATTEMPTS),
+        ).fetchall()
+        for row in rows:
+            conn.execute("UPDATE tasks SET status = 'failed', error = ? WHERE task_id = ?",
+                         ("lease expired", row["task_id"]))
+            self._finish_job(conn, row["job_id"], "error",
+                             f"Erro: nenhum worker concluiu a tarefa após {TASK_MAX_ATTEMPTS} tentativas.")
+
+    # ---------- Jobs ----------
+
+    def create_job(self, job_id, kind):
+        with self._connect() as conn:
+            conn.execute("INSERT INTO jobs (job_id, kind, created) VALUES (?, ?, ?)", (job_id, kind, time.time()))
+
+    def get_job(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT job_id, kind, status, output_file, cancelled FROM jobs WHERE job_id = ?",
+                               (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {**dict(row), "cancelled": bool(row["cancelled"])}
+
+    def update_job(self, job_id, status=None, output_file=None):
+        with self._connect() as conn:
+            if status is not None:
+                conn.execute("UPDATE jobs SET status = ? WHERE job_id = ?", (status, job_id))
+            if output_file is not None:
+                conn.execute("UPDATE jobs SET output_file = ? WHERE job_id = ?", (output_file, job_id))
+
+    def cancel(self, job_id):
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET cancelled = 1 WHERE job_id = ?", (job_id,))
+            # Tasks nobody started yet are dropped right away
+            conn.execute("UPDATE tasks SET status = 'cancelled' WHERE job_id = ? AND status = 'queued'", (job_id,))
+            self._finish_if_cancelled(conn, job_id)
+
+    def is_cancelled(self, job_id):
+        job = self.get_job(job_id)
+        return bool(job and job["cancelled"])
+
+    # ---------- Tasks ----------
+
+    def enqueue(self, job_id, kind, payload):
+        with self._transaction() as conn:
+            # A task enqueued after a cancel (e.g. stage 2 by a finishing stage 1) is never run
+            cancelled = conn.execute("SELECT 1 FROM jobs WHERE job_id = ? AND cancelled = 1", (job_id,)).fetchone()
+            cursor = conn.execute(
+                "INSERT INTO tasks (job_id, kind, payload, status, created) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), "cancelled" if cancelled else "queued", time.time()),
+            )
+            return cursor.lastrowid
+
+    def claim(self, worker_id, kinds, lease_seconds=TASK_LEASE_SECONDS):
+        now = time.time()
+        placeholders = ",".join("?" for _ in kinds)
+        with self._transaction() as conn:
+            self._fail_expired(conn, now)
+            row = conn.execute(
+                f"""SELECT task_id, job_id, kind, payload, attempts FROM tasks
+                    WHERE kind IN ({placeholders})
+                      AND (status = 'queued' OR (status = 'running' AND lease_expires < ?))
+                      AND attempts < ?
+                    ORDER BY task_id LIMIT 1""",
+                (*kinds, now, TASK_MAX_ATTEMPTS),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    """UPDATE tasks SET status = 'running', worker_id = ?, lease_expires = ?,
+                           attempts = attempts + 1
+                       WHERE task_id = ?""",
+                    (worker_id, now + lease_seconds, row["task_id"]),
+                )
+        if row is None:
+            return None
+        return {
+            "task_id": row["task_id"],
+            "job_id": row["job_id"],
+            "kind": row["kind"],
+            "payload": json.loads(row["payload"]),
+            "attempts": row["attempts"] + 1,
+        }
+
+    def renew(self, task_id, lease_seconds=TASK_LEASE_SECONDS):
+        with self._connect() as conn:
+            conn.execute("UPDATE tasks SET lease_expires = ? WHERE task_id = ? AND status = 'running'",
+                         (time.time() + lease_seconds, task_id))
+
+    def complete(self, task_id):
+        with self._transaction() as conn:
+            conn.execute("UPDATE tasks SET status = 'done' WHERE task_id = ?", (task_id,))
+            row = conn.execute("SELECT job_id FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+            if row is not None:
+                self._finish_if_cancelled(conn, row["job_id"])
+
+    def fail(self, task_id, error):
+        with self._connect() as conn:
+            conn.execute("UPDATE tasks SET status = 'failed', error = ? WHERE task_id = ?", (str(error), task_id))
+
+    # ---------- Events ----------
+
+    def publish(self, job_id, event):
+        with self._connect() as conn:
+            conn.execute("INSERT INTO events (job_id, data) VALUES (?, ?)", (job_id, json.dumps(event, default=str)))
+
+    def events_after(self, job_id, after_id=0, limit=500):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT event_id, data FROM events WHERE job_id = ? AND event_id > ? ORDER BY event_id LIMIT ?",
+                (job_id, after_id, limit),
+            ).fetchall()
+        return [(row["event_id"], json.loads(row["data"])) for row in rows]
+
+
+# Broker backends by URL scheme; register new ones here (e.g. "redis": RedisBroker)
+BROKER_BACKENDS = {
+    "sqlite": lambda url: SQLiteBroker(_sqlite_path(url)),
+}
+
+
+def _sqlite_path(url):
+    # sqlite:///abs/path.db -> /abs/path.db ; sqlite:relative.db -> relative.db
+    path = url[len("sqlite:"):]
+    return path[2:] if path.startswith("//") else path
+
+
+def open_broker(url):
+    """Creates the broker for a JOB_BROKER_URL such as "sqlite:///var/lib/maps/broker.db"."""
+    scheme = urlparse(url).scheme
+    if scheme not in BROKER_BACKENDS:
+        raise ValueError(f"Broker não suportado: '{scheme}' (disponíveis: {', '.join(BROKER_BACKENDS)})")
+    return BROKER_BACKENDS[scheme](url)
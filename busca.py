@@ -1,8 +1,11 @@
 import re
+import time
 import requests
 import pandas as pd
 from bs4 import BeautifulSoup
 
+from contacts import normalize_contacts
+
 SOCIAL_DOMAINS = [
     "facebook.com",
     "instagram.com",
@@ -21,6 +24,13 @@ HEADERS = {
     )
 }
 
+# Download do site em blocos: o cancelamento é verificado a cada bloco e o tempo total é limitado
+# (o timeout do requests vale por leitura de socket, não para a resposta inteira)
+FETCH_TIMEOUT = (5, 5)  # (conexão, leitura de cada bloco) em segundos
+FETCH_MAX_SECONDS = 20
+FETCH_MAX_BYTES = 2 * 1024 * 1024
+FETCH_CHUNK_SIZE = 16 * 1024
+
 EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
 PHONE_RE = re.compile(
     r"\(?\d{2}\)?\s*\d{4,5}[.\-\s]?\d{4}"
@@ -66,50 +76,92 @@ def extract_contacts(html, url):
     )
 
 
-def main(input_file="output.csv", output_file="busca.csv", progress_callback=None):
+def download_page(url, cancel_event=None):
+    """Baixa o HTML do site; retorna None se a busca for cancelada durante o download."""
+    deadline = time.monotonic() + FETCH_MAX_SECONDS
+    with requests.get(url, headers=HEADERS, timeout=FETCH_TIMEOUT, verify=True, stream=True) as resp:
+        resp.raise_for_status()
+        chunks = []
+        size = 0
+        for chunk in resp.iter_content(FETCH_CHUNK_SIZE):
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            if time.monotonic() > deadline:
+                raise requests.exceptions.Timeout(f"download levou mais de {FETCH_MAX_SECONDS}s")
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= FETCH_MAX_BYTES:
+                break
+        return b"".join(chunks).decode(resp.encoding or "utf-8", errors="replace")
+
+
+def fetch_contacts(url, name="N/A", cancel_event=None):
+    """Baixa o site da empresa e extrai (email, telefone, redes sociais)."""
+    email, phone, socials = "N/A", "N/A", "N/A"
+
+    if pd.notna(url) and url != "N/A":
+        try:
+            html = download_page(url, cancel_event)
+            if html is not None:
+                email, phone, socials = extract_contacts(html, url)
+        except requests.exceptions.SSLError:
+            print(f"  [SSL erro] {name} — {url}")
+        except requests.exceptions.ConnectionError:
+            print(f"  [Conexão erro] {name} — {url}")
+        except requests.exceptions.Timeout:
+            print(f"  [Timeout] {name} — {url}")
+        except requests.exceptions.RequestException as e:
+            print(f"  [Erro] {name} — {e}")
+
+    return email, phone, socials
+
+
+def build_row(name, address, url, contacts):
+    email, phone, socials = contacts
+    return {
+        "Name": name,
+        "Full Address": address,
+        "Email": email,
+        "Telefone": phone,
+        "URL": url,
+        "Redes Sociais": socials,
+    }
+
+
+def write_output(out, output_file):
+    if output_file.endswith(".xlsx"):
+        out.to_excel(output_file, index=False)
+    else:
+        out.to_csv(output_file, index=False)
+    print(f"\nArquivo '{output_file}' gerado com {len(out)} registros.")
+
+
+def main(input_file="output.csv", output_file="busca.csv", progress_callback=None, cancel_event=None):
     df = pd.read_csv(input_file)
     rows = []
     total = len(df)
+    # Cada site é baixado uma vez só, mesmo que apareça em mais de uma linha
+    contacts_by_url = {}
 
     for i, row in df.iterrows():
         name = row.get("Name", "N/A")
         address = row.get("Full Address", "N/A")
         url = row.get("URL", "N/A")
 
-        email, phone, socials = "N/A", "N/A", "N/A"
-
-        if pd.notna(url) and url != "N/A":
-            try:
-                resp = requests.get(url, headers=HEADERS, timeout=10, verify=True)
-                resp.raise_for_status()
-                email, phone, socials = extract_contacts(resp.text, url)
-            except requests.exceptions.SSLError:
-                print(f"  [SSL erro] {name} — {url}")
-            except requests.exceptions.ConnectionError:
-                print(f"  [Conexão erro] {name} — {url}")
-            except requests.exceptions.Timeout:
-                print(f"  [Timeout] {name} — {url}")
-            except requests.exceptions.RequestException as e:
-                print(f"  [Erro] {name} — {e}")
-
-        rows.append({
-            "Name": name,
-            "Full Address": address,
-            "Email": email,
-            "Telefone": phone,
-            "URL": url,
-            "Redes Sociais": socials,
-        })
+        # Ponto de cancelamento: empresas restantes seguem sem contatos no arquivo parcial
+        if cancel_event is not None and cancel_event.is_set():
+            rows.append(build_row(name, address, url, ("N/A", "N/A", "N/A")))
+            continue
+
+        if url not in contacts_by_url:
+            contacts_by_url[url] = fetch_contacts(url, name, cancel_event)
+        rows.append(build_row(name, address, url, contacts_by_url[url]))
         print(f"Empresa {i + 1}/{total} processada: {name}")
         if progress_callback:
             progress_callback(i + 1, total)
 
-    out = pd.DataFrame(rows)
-    if output_file.endswith(".xlsx"):
-        out.to_excel(output_file, index=False)
-    else:
-        out.to_csv(output_file, index=False)
-    print(f"\nArquivo '{output_file}' gerado com {len(out)} registros.")
+    # Normalizar telefones (E.164), e-mails e redes sociais de todo o resultado de uma vez
+    write_output(normalize_contacts(pd.DataFrame(rows)), output_file)
 
 
 if __name__ == "__main__":
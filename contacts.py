@@ -0,0 +1,126 @@
+import re
+
+import pandas as pd
+
+SEPARATOR = " | "
+
+# Brazilian area codes (DDD) in use
+VALID_DDDS = {
+    "11", "12", "13", "14", "15", "16", "17", "18", "19",
+    "21", "22", "24", "27", "28",
+    "31", "32", "33", "34", "35", "37", "38",
+    "41", "42", "43", "44", "45", "46", "47", "48", "49",
+    "51", "53", "54", "55",
+    "61", "62", "63", "64", "65", "66", "67", "68", "69",
+    "71", "73", "74", "75", "77", "79",
+    "81", "82", "83", "84", "85", "86", "87", "88", "89",
+    "91", "92", "93", "94", "95", "96", "97", "98", "99",
+}
+
+# Addresses that show up in site HTML but never belong to the business
+EMAIL_BLOCKED_DOMAINS = (
+    "sentry.io", "sentry-next.wixpress.com", "sentry.wixpress.com", "wixpress.com", "wix.com",
+    "example.com", "example.org", "domain.com", "dominio.com.br", "email.com", "seudominio.com.br",
+    "godaddy.com", "mysite.com", "yoursite.com",
+)
+EMAIL_BLOCKED_LOCAL_PARTS = ("noreply", "no-reply", "nao-responda", "naoresponda", "user", "usuario", "seuemail")
+EMAIL_RE = r"[a-z0-9._%+-]+@[a-z0-9-]+(?:\.[a-z0-9-]+)*\.[a-z]{2,}"
+# Asset names like logo@2x.png match EMAIL_RE
+EMAIL_FILE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".css", ".js")
+
+SOCIAL_HOST_ALIASES = {"twitter.com": "x.com", "fb.com": "facebook.com", "youtu.be": "youtube.com"}
+# Profiles on these networks are case-insensitive
+SOCIAL_CASE_INSENSITIVE = {"instagram.com", "x.com", "tiktok.com"}
+# Whole path segments only, so profiles like /tropicalmoda or /homecenter are kept
+SOCIAL_NON_PROFILE_PATHS = r"^/(?:sharer|share|intent|dialog|plugins|tr|hashtag|home|login)(?:[/.?]|$)|^/(?:p|reel)/"
+
+
+def explode_column(series):
+    """Splits " | "-joined cells into one row per value, keeping the original index."""
+    parts = series.fillna("N/A").astype(str).str.split("|").explode().str.strip()
+    return parts[(parts != "") & (parts.str.upper() != "N/A")]
+
+
+def implode_values(values, index):
+    """Joins values back into one " | " cell per original row (first-seen order, no repeats)."""
+    values = values.dropna()
+    values = values[~pd.DataFrame({"row": values.index, "value": values.values}).duplicated().values]
+    joined = values.groupby(level=0).agg(SEPARATOR.join)
+    return joined.reindex(index, fill_value="N/A")
+
+
+def normalize_phones(parts):
+    """Raw phone matches -> (E.164 numbers, is_mobile mask). Invalid numbers come back as NaN.
+
+    Handles "+55", trunk "0" and carrier-code prefixes; numbers without a valid
+    DDD, and non-geographic ones such as 0800, are dropped.
+    """
+    digits = parts.str.replace(r"\D", "", regex=True)
+    lengths = digits.str.len()
+    international = digits.str.startswith("55") & lengths.isin([12, 13])
+    national = digits.where(~international, digits.str[2:])
+    national = national.str.replace(r"^0+", "", regex=True)
+    # 0 + carrier (2 digits) + DDD + number
+    with_carrier = ~international & digits.str.startswith("0") & national.str.len().isin([12, 13])
+    national = national.where(~with_carrier, national.str[2:])
+
+    ddd = national.str[:2]
+    subscriber = national.str[2:]
+    lengths = national.str.len()
+    is_mobile = (lengths == 11) & subscriber.str.startswith("9")
+    is_landline = (lengths == 10) & subscriber.str[:1].isin(["2", "3", "4", "5"])
+    valid = ddd.isin(VALID_DDDS) & (is_mobile | is_landline)
+    return ("+55" + national).where(valid), is_mobile & valid
+
+
+def normalize_emails(parts):
+    """Lowercased, validated addresses; blocklisted or machine-generated ones come back as NaN."""
+    emails = parts.str.lower().str.strip().str.replace(r"^mailto:", "", regex=True).str.replace("%20", "")
+    valid = emails.str.fullmatch(EMAIL_RE).fillna(False)
+    local = emails.str.split("@").str[0]
+    domain = emails.str.split("@").str[-1]
+    blocked = (
+        domain.isin(EMAIL_BLOCKED_DOMAINS)
+        | domain.str.endswith(tuple("." + d for d in EMAIL_BLOCKED_DOMAINS))
+        | local.isin(EMAIL_BLOCKED_LOCAL_PARTS)
+        | emails.str.endswith(EMAIL_FILE_EXTENSIONS)
+        # Hash-like local parts (e.g. Sentry DSNs: 605a7baede844d278b89dc95ae0a9123@...)
+        | local.str.fullmatch(r"[0-9a-f]{16,}").fillna(False)
+    )
+    return emails.where(valid & ~blocked)
+
+
+def normalize_socials(parts):
+    """Canonical https://host/path profile URLs; share/intent links and bare domains come back as NaN."""
+    pieces = parts.str.extract(
+        r"^(?:[a-z]+:)?(?://)?(?:www\.|m\.|mobile\.|web\.|[a-z]{2}-[a-z]{2}\.)?([^/?#\s]+)(/[^?#\s]*)?",
+        flags=re.IGNORECASE,
+    )
+    host = pieces[0].str.lower().replace(SOCIAL_HOST_ALIASES)
+    path = pieces[1].fillna("").str.rstrip("/")
+    path = path.where(~host.isin(SOCIAL_CASE_INSENSITIVE), path.str.lower())
+    is_profile = (path != "") & ~path.str.contains(SOCIAL_NON_PROFILE_PATHS, regex=True).fillna(True)
+    return ("https://" + host + path).where(is_profile & host.notna())
+
+
+def normalize_contacts(df, email_col="Email", phone_col="Telefone", social_col="Redes Sociais"):
+    """Normalizes the contact columns of a whole result set at once.
+
+    Every column is exploded into a long Series, normalized with vectorized
+    pandas string operations and joined back, so the cost doesn't grow with
+    per-row Python loops. Adds a "WhatsApp" column with the mobile numbers.
+    """
+    out = df.copy()
+
+    if phone_col in out.columns:
+        phones, is_mobile = normalize_phones(explode_column(out[phone_col]))
+        out[phone_col] = implode_values(phones, out.index)
+        out["WhatsApp"] = implode_values(phones[is_mobile], out.index)
+
+    if email_col in out.columns:
+        out[email_col] = implode_values(normalize_emails(explode_column(out[email_col])), out.index)
+
+    if social_col in out.columns:
+        out[social_col] = implode_values(normalize_socials(explode_column(out[social_col])), out.index)
+
+    return out
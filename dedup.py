@@ -0,0 +1,226 @@
+import zlib
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import numpy as np
+
+from busca import SOCIAL_DOMAINS
+from text import is_missing, normalize_text
+
+# Words that don't identify a business ("Confecções Silva Ltda" ~ "Silva Confecções")
+NAME_STOPWORDS = {
+    "ltda", "me", "epp", "eireli", "sa", "s/a", "cia", "e", "de", "da", "do", "das", "dos", "the", "and",
+}
+GEOHASH_PRECISION = 7  # ~150m cells
+MAX_BLOCK_SIZE = 200  # blocks larger than this (very common tokens) are skipped
+TRIGRAM_BUCKETS = 256
+
+# A pair is a duplicate if any of these rules holds
+SAME_DOMAIN_NAME_SIMILARITY = 0.5
+NEARBY_METERS = 100
+NEARBY_NAME_SIMILARITY = 0.6
+NAME_SIMILARITY = 0.85
+ADDRESS_SIMILARITY = 0.7
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def name_tokens(name):
+    return [t for t in normalize_text(name).split() if t not in NAME_STOPWORDS and len(t) > 1]
+
+
+def website_domain(url):
+    """Registrable-ish host of a business website; None for social profiles and missing URLs."""
+    if is_missing(url):
+        return None
+    host = urlparse(str(url)).netloc.lower().split(":")[0]
+    if host.startswith("www."):
+        host = host[4:]
+    if not host or any(host == d or host.endswith("." + d) for d in SOCIAL_DOMAINS):
+        return None
+    return host
+
+
+def geohash(lat, lng, precision=GEOHASH_PRECISION):
+    if is_missing(lat) or is_missing(lng):
+        return None
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    code, bits, bit_count, even = [], 0, 0, True
+    while len(code) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            code.append(_GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return "".join(code)
+
+
+def blocking_keys(record):
+    """Keys whose records are compared with each other: name tokens, geohash cell, website domain."""
+    keys = {("name", token) for token in name_tokens(record.get("Name"))}
+    cell = geohash(record.get("lat"), record.get("lng"))
+    if cell:
+        keys.add(("geo", cell))
+    domain = website_domain(record.get("URL"))
+    if domain:
+        keys.add(("domain", domain))
+    return keys
+
+
+def candidate_pairs(records):
+    """Index pairs (i < j) sharing at least one blocking key, as two numpy arrays."""
+    blocks = defaultdict(list)
+    for i, record in enumerate(records):
+        for key in blocking_keys(record):
+            blocks[key].append(i)
+
+    n = len(records)
+    codes = []
+    for members in blocks.values():
+        if len(members) < 2 or len(members) > MAX_BLOCK_SIZE:
+            continue
+        idx = np.array(members, dtype=np.int64)
+        a, b = np.triu_indices(len(idx), k=1)
+        # Encode (i, j) as i * n + j so pairs found in several blocks collapse in np.unique
+        codes.append(idx[a] * n + idx[b])
+
+    if not codes:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    unique = np.unique(np.concatenate(codes))
+    return unique // n, unique % n
+
+
+def _trigram_matrix(texts):
+    """Hashed character-trigram presence vectors, one row per text."""
+    matrix = np.zeros((len(texts), TRIGRAM_BUCKETS), dtype=bool)
+    for row, text in enumerate(texts):
+        padded = f"  {text} "
+        for k in range(len(padded) - 2):
+            # crc32 rather than hash(): str hashing is salted per process and would make merges vary
+            matrix[row, zlib.crc32(padded[k:k + 3].encode()) % TRIGRAM_BUCKETS] = True
+    return matrix
+
+
+def _jaccard(matrix, left, right):
+    inter = (matrix[left] & matrix[right]).sum(axis=1)
+    union = (matrix[left] | matrix[right]).sum(axis=1)
+    return np.divide(inter, union, out=np.zeros(len(left)), where=union > 0)
+
+
+def _haversine_meters(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371000 * np.arcsin(np.sqrt(h))
+
+
+def duplicate_pairs(records):
+    """Scores all candidate pairs at once and returns the (i, j) pairs judged duplicates."""
+    left, right = candidate_pairs(records)
+    if len(left) == 0:
+        return []
+
+    names = _trigram_matrix([" ".join(sorted(name_tokens(r.get("Name")))) for r in records])
+    addresses = _trigram_matrix([normalize_text(r.get("Full Address")) for r in records])
+    has_address = np.array([not is_missing(r.get("Full Address")) for r in records])
+    domains = np.array([website_domain(r.get("URL")) or "" for r in records], dtype=object)
+    coords = np.array([[np.nan if is_missing(r.get(k)) else float(r.get(k)) for k in ("lat", "lng")]
+                       for r in records])
+
+    name_sim = _jaccard(names, left, right)
+    address_sim = _jaccard(addresses, left, right)
+    same_domain = (domains[left] == domains[right]) & (domains[left] != "")
+    with np.errstate(invalid="ignore"):
+        distance = _haversine_meters(coords[left, 0], coords[left, 1], coords[right, 0], coords[right, 1])
+    nearby = np.nan_to_num(distance, nan=np.inf) <= NEARBY_METERS
+    both_addresses = has_address[left] & has_address[right]
+
+    # A shared website alone isn't enough: branches of a chain share it too
+    same_location = nearby | (both_addresses & (address_sim >= ADDRESS_SIMILARITY))
+    is_duplicate = (
+        (same_domain & same_location & (name_sim >= SAME_DOMAIN_NAME_SIMILARITY))
+        | (nearby & (name_sim >= NEARBY_NAME_SIMILARITY))
+        | ((name_sim >= NAME_SIMILARITY) & both_addresses & (address_sim >= ADDRESS_SIMILARITY))
+    )
+    return list(zip(left[is_duplicate].tolist(), right[is_duplicate].tolist()))
+
+
+def cluster_records(records):
+    """Returns, for each record, the index of the first record of its duplicate cluster."""
+    parent = list(range(len(records)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in duplicate_pairs(records):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            # The smaller index always wins, so clustering doesn't depend on pair order
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+    return [find(i) for i in range(len(records))]
+
+
+def merge_records(records):
+    """Merges a cluster deterministically.
+
+    The most complete record (ties: first seen) is kept, and its missing
+    fields are filled from the other records in their original order.
+    """
+    def completeness(item):
+        index, record = item
+        return (-sum(not is_missing(v) for v in record.values()), index)
+
+    ordered = [r for _, r in sorted(enumerate(records), key=completeness)]
+    merged = dict(ordered[0])
+    for record in records:
+        for field, value in record.items():
+            if is_missing(merged.get(field)) and not is_missing(value):
+                merged[field] = value
+    return merged
+
+
+class DuplicateTracker:
+    """cluster_records for records that arrive one at a time (e.g. rows streamed live).
+
+    add() tells whether a record starts a new cluster, i.e. whether it is not
+    a duplicate of any record added before it, under the same rules as
+    duplicate_pairs. Only records sharing a blocking key are scored.
+    """
+
+    def __init__(self):
+        self._records = []
+        self._blocks = defaultdict(list)
+
+    def add(self, record):
+        keys = blocking_keys(record)
+        candidates = set()
+        for key in keys:
+            if len(self._blocks[key]) < MAX_BLOCK_SIZE:
+                candidates.update(self._blocks[key])
+        for key in keys:
+            self._blocks[key].append(len(self._records))
+        self._records.append(record)
+        if not candidates:
+            return True
+
+        subset = [self._records[i] for i in sorted(candidates)] + [record]
+        new = len(subset) - 1
+        return not any(new in pair for pair in duplicate_pairs(subset))
+
+
+def deduplicate(records):
+    """Collapses duplicate businesses, keeping the order of first appearance."""
+    clusters = defaultdict(list)
+    for record, root in zip(records, cluster_records(records)):
+        clusters[root].append(record)
+    return [merge_records(members) for _, members in sorted(clusters.items())]
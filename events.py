@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import deque
+
+
+class EventBroadcaster:
+    """Fan-out of a job's progress events to any number of SSE subscribers.
+
+    Events get monotonically increasing ids and are kept in a bounded ring
+    buffer, so a reconnecting client can replay everything after its
+    Last-Event-ID. Events published with a `coalesce_key` are rate-limited to
+    `max_rate` per second: within the interval only the latest one is kept and
+    delivered once the interval elapses. Events without a key (terminal status)
+    are always delivered immediately and close the stream.
+    """
+
+    def __init__(self, buffer_size=1000, max_rate=4, merge=None):
+        self._buffer = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._next_id = 1
+        self._interval = 1.0 / max_rate if max_rate else 0.0
+        self._last_emit = 0.0
+        self._pending = None  # (coalesce_key, event) waiting for the rate limit
+        # Optional merge(older, newer) -> event used when coalescing, e.g. to keep result rows
+        self._merge = merge
+        self.closed = False
+
+    # ---------- Publishing ----------
+
+    def publish(self, event, coalesce_key=None):
+        with self._cond:
+            if self.closed:
+                return
+            now = time.monotonic()
+
+            if coalesce_key is None:
+                self._flush_pending()
+                self._append(event, now)
+                self.closed = True
+            else:
+                if self._pending is not None:
+                    pending_key, pending_event = self._pending
+                    if pending_key != coalesce_key:
+                        # Never merge across stages: emit the old one as-is
+                        self._flush_pending()
+                    elif self._merge:
+                        event = self._merge(pending_event, event)
+                self._pending = (coalesce_key, event)
+                if now - self._last_emit >= self._interval:
+                    self._flush_pending()
+
+            self._cond.notify_all()
+
+    def _append(self, event, now):
+        self._buffer.append((self._next_id, event))
+        self._next_id += 1
+        self._last_emit = now
+
+    def _flush_pending(self):
+        if self._pending is not None:
+            self._append(self._pending[1], time.monotonic())
+            self._pending = None
+
+    def _flush_due(self):
+        """Emits the pending event if its rate-limit interval has elapsed. Returns the wait left."""
+        if self._pending is None:
+            return None
+        remaining = self._interval - (time.monotonic() - self._last_emit)
+        if remaining <= 0:
+            self._flush_pending()
+            self._cond.notify_all()
+            return None
+        return remaining
+
+    # ---------- Subscribing ----------
+
+    def subscribe(self, last_event_id=None, timeout=30):
+        """Yields (event_id, event) tuples, or None after `timeout` seconds without events.
+
+        Starts after `last_event_id` (replaying buffered events) and stops once
+        the terminal event has been delivered. An id this broadcaster never
+        issued (e.g. from before an API restart) replays from the start, and a
+        finished stream always ends with its terminal event.
+        """
+        cursor = int(last_event_id) if last_event_id else 0
+        with self._cond:
+            if cursor >= self._next_id:
+                cursor = 0
+            elif self.closed and self._pending is None and self._buffer and cursor >= self._buffer[-1][0]:
+                # Client already past the end: repeat the terminal event so it stops reconnecting
+                cursor = self._buffer[-1][0] - 1
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + timeout
+                while True:
+                    new = [(eid, ev) for eid, ev in self._buffer if eid > cursor]
+                    if new or (self.closed and self._pending is None):
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    pending_wait = self._flush_due()
+                    if pending_wait is not None:
+                        remaining = min(remaining, pending_wait)
+                    self._cond.wait(remaining)
+                done = self.closed and (not new or new[-1][0] == self._next_id - 1)
+
+            if not new:
+                if done:
+                    return
+                yield None
+                continue
+            for item in new:
+                yield item
+            cursor = new[-1][0]
+            if done:
+                return
@@ -1,5 +1,6 @@
 import { useState, useRef } from 'react'
 import AuthForm from './AuthForm.jsx'
+import ResultsTable from './ResultsTable.jsx'
 
 function ProgressBar({ label, current, total }) {
   const percent = total > 0 ? Math.round((current / total) * 100) : 0
@@ -26,8 +27,11 @@ export default function App() {
   const [stage1, setStage1] = useState({ current: 0, total: 0 })
   const [stage2, setStage2] = useState({ current: 0, total: 0 })
   const [message, setMessage] = useState('')
-  const [status, setStatus] = useState('idle') // idle | running | completed | error
+  const [status, setStatus] = useState('idle') // idle | running | completed | cancelled | error
   const jobIdRef = useRef(null)
+  const lastEventIdRef = useRef('')
+  const [rows, setRows] = useState([])
+  const rowCountRef = useRef(0)
 
   function handleAuth(newToken, newUsername) {
     setToken(newToken)
@@ -43,9 +47,34 @@ export default function App() {
     setMessage('')
     setStage1({ current: 0, total: 0 })
     setStage2({ current: 0, total: 0 })
+    resetRows()
     jobIdRef.current = null
   }
 
+  function resetRows() {
+    rowCountRef.current = 0
+    setRows([])
+  }
+
+  // Appends a batch of result rows starting at rowStart, ignoring ones we already have
+  function appendRows(rowStart, batch) {
+    const known = rowCountRef.current
+    if (rowStart > known) return false
+    const fresh = batch.slice(known - rowStart)
+    if (fresh.length === 0) return true
+    rowCountRef.current = known + fresh.length
+    setRows((prev) => prev.concat(fresh))
+    return true
+  }
+
+  // Fills a gap in the streamed rows (e.g. events dropped from the server's replay buffer)
+  async function fetchMissingRows(jobId, ticket) {
+    const res = await fetch(`/api/results/${jobId}?ticket=${encodeURIComponent(ticket)}&offset=${rowCountRef.current}`)
+    if (!res.ok) return
+    const data = await res.json()
+    appendRows(data.row_start, data.rows)
+  }
+
   async function handleStart() {
     if (!termo.trim() || !cidade.trim()) return
 
@@ -53,6 +82,7 @@ export default function App() {
     setStatus('running')
     setStage1({ current: 0, total: 0 })
     setStage2({ current: 0, total: 0 })
+    resetRows()
     setMessage('Iniciando busca...')
 
     try {
@@ -78,7 +108,10 @@ export default function App() {
       }
 
       jobIdRef.current = data.job_id
-      listenProgress(data.job_id)
+      lastEventIdRef.current = ''
+      const ticket = await fetchStreamTicket(data.job_id)
+      if (!ticket) return
+      listenProgress(data.job_id, ticket)
     } catch (err) {
       setMessage('Erro de conexão com o servidor.')
       setStatus('error')
@@ -86,12 +119,40 @@ export default function App() {
     }
   }
 
-  function listenProgress(jobId) {
-    const evtSource = new EventSource(`/api/progress/${jobId}?token=${encodeURIComponent(token)}`)
+  // Short-lived, job-scoped ticket so the JWT never goes into EventSource / download URLs
+  async function fetchStreamTicket(jobId) {
+    const res = await fetch(`/api/stream-ticket/${jobId}`, {
+      method: 'POST',
+      headers: { 'Authorization': `Bearer ${token}` },
+    })
+    if (res.status === 401) {
+      handleLogout()
+      return null
+    }
+    if (!res.ok) {
+      setMessage('Erro ao conectar ao progresso da busca.')
+      setStatus('error')
+      setLoading(false)
+      return null
+    }
+    const data = await res.json()
+    return data.ticket
+  }
+
+  function listenProgress(jobId, ticket, retries = 0) {
+    // Resume after the last event we saw; the server replays anything missed
+    const resume = lastEventIdRef.current ? `&last_event_id=${lastEventIdRef.current}` : ''
+    const evtSource = new EventSource(`/api/progress/${jobId}?ticket=${encodeURIComponent(ticket)}&rows=1${resume}`)
 
     evtSource.onmessage = (event) => {
       const msg = JSON.parse(event.data)
       if (msg.keepalive) return
+      if (event.lastEventId) lastEventIdRef.current = event.lastEventId
+      retries = 0
+
+      if (msg.rows && !appendRows(msg.row_start, msg.rows)) {
+        fetchMissingRows(jobId, ticket)
+      }
 
       if (msg.message) setMessage(msg.message)
 
@@ -101,8 +162,8 @@ export default function App() {
         setStage2({ current: msg.current, total: msg.total })
       }
 
-      if (msg.status === 'completed') {
-        setStatus('completed')
+      if (msg.status === 'completed' || msg.status === 'cancelled') {
+        setStatus(msg.status)
         setLoading(false)
         evtSource.close()
       } else if (msg.status === 'error') {
@@ -112,18 +173,45 @@ export default function App() {
       }
     }
 
-    evtSource.onerror = () => {
+    evtSource.onerror = async () => {
+      // The browser retries on its own while CONNECTING; a CLOSED source needs a new ticket
+      if (evtSource.readyState !== EventSource.CLOSED) {
+        setMessage('Reconectando ao servidor...')
+        return
+      }
+      if (retries < 3) {
+        const newTicket = await fetchStreamTicket(jobId)
+        if (newTicket) listenProgress(jobId, newTicket, retries + 1)
+        return
+      }
       setMessage('Conexão com o servidor perdida.')
       setStatus('error')
       setLoading(false)
-      evtSource.close()
     }
   }
 
-  function handleDownload() {
+  async function handleCancel() {
+    if (!jobIdRef.current) return
+    const res = await fetch(`/api/cancel/${jobIdRef.current}`, {
+      method: 'POST',
+      headers: { 'Authorization': `Bearer ${token}` },
+    })
+    if (res.status === 401) {
+      handleLogout()
+      return
+    }
+    // The final "cancelled" event arrives through the progress stream
+    if (res.ok) setMessage('Cancelando busca...')
+  }
+
+  async function handleDownload(partial = false) {
     if (jobIdRef.current) {
-      // Append token as query param since fetch with custom headers can't be used for direct downloads
-      window.open(`/api/download/${jobIdRef.current}?token=${encodeURIComponent(token)}`, '_blank')
+      // Direct downloads can't send custom headers, so use a fresh stream ticket instead of the token
+      const ticket = await fetchStreamTicket(jobIdRef.current)
+      if (!ticket) return
+      const link = document.createElement('a')
+      link.href = `/api/download/${jobIdRef.current}?ticket=${encodeURIComponent(ticket)}${partial ? '&partial=1' : ''}`
+      link.click()
     }
   }
 
@@ -167,6 +255,11 @@ export default function App() {
         <button onClick={handleStart} disabled={loading || !termo.trim() || !cidade.trim()}>
           {loading ? 'Buscando...' : 'Iniciar Busca'}
         </button>
+        {loading && jobIdRef.current && (
+          <button className="cancel-btn" onClick={handleCancel}>
+            Cancelar Busca
+          </button>
+        )}
       </div>
 
       {status !== 'idle' && (
@@ -177,10 +270,24 @@ export default function App() {
           <p className={`message ${status}`}>{message}</p>
 
           {status === 'completed' && (
-            <button className="download-btn" onClick={handleDownload}>
+            <button className="download-btn" onClick={() => handleDownload()}>
               Baixar Arquivo Excel
             </button>
           )}
+
+          {status === 'cancelled' && (
+            <button className="download-btn" onClick={() => handleDownload()}>
+              Baixar Resultados Parciais
+            </button>
+          )}
+
+          {status === 'running' && rows.length > 0 && (
+            <button className="download-btn partial-download-btn" onClick={() => handleDownload(true)}>
+              Baixar Resultados Parciais ({rows.length})
+            </button>
+          )}
+
+          {rows.length > 0 && <ResultsTable rows={rows} />}
         </div>
       )}
     </div>
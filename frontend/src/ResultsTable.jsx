@@ -0,0 +1,70 @@
+import { useState } from 'react'
+
+// Same order as RESULT_COLUMNS in server.py
+const COL = { name: 0, address: 1, email: 2, url: 3, lat: 4, lng: 5 }
+
+const ROW_HEIGHT = 36
+const VIEWPORT_HEIGHT = 360
+const OVERSCAN = 8
+
+function display(value) {
+  return value === null || value === undefined || value === 'N/A' ? '—' : value
+}
+
+// Scraped URLs come from third-party pages: only http(s) ones become links (no javascript:, data:, ...)
+function safeHref(value) {
+  try {
+    const url = new URL(value)
+    return url.protocol === 'http:' || url.protocol === 'https:' ? url.href : null
+  } catch {
+    return null
+  }
+}
+
+export default function ResultsTable({ rows }) {
+  const [scrollTop, setScrollTop] = useState(0)
+
+  // Only render the rows inside the viewport (plus a small overscan) so thousands of rows stay smooth
+  const first = Math.max(0, Math.floor(scrollTop / ROW_HEIGHT) - OVERSCAN)
+  const last = Math.min(rows.length, Math.ceil((scrollTop + VIEWPORT_HEIGHT) / ROW_HEIGHT) + OVERSCAN)
+  const visible = rows.slice(first, last)
+
+  return (
+    <div className="results-table">
+      <div className="results-table-header">
+        <span>#</span>
+        <span>Nome</span>
+        <span>Endereço</span>
+        <span>Site</span>
+      </div>
+      <div
+        className="results-table-viewport"
+        style={{ height: Math.min(VIEWPORT_HEIGHT, rows.length * ROW_HEIGHT) }}
+        onScroll={(e) => setScrollTop(e.currentTarget.scrollTop)}
+      >
+        <div style={{ height: rows.length * ROW_HEIGHT, position: 'relative' }}>
+          {visible.map((row, i) => {
+            const index = first + i
+            const href = safeHref(row[COL.url])
+            return (
+              <div
+                key={index}
+                className="results-table-row"
+                style={{ top: index * ROW_HEIGHT, height: ROW_HEIGHT }}
+              >
+                <span>{index + 1}</span>
+                <span title={row[COL.name]}>{display(row[COL.name])}</span>
+                <span title={row[COL.address]}>{display(row[COL.address])}</span>
+                <span>
+                  {href
+                    ? <a href={href} target="_blank" rel="noreferrer">{row[COL.url]}</a>
+                    : display(row[COL.url])}
+                </span>
+              </div>
+            )
+          })}
+        </div>
+      </div>
+    </div>
+  )
+}
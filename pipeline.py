@@ -0,0 +1,119 @@
+import os
+
+from app import scrape_google_maps, save_to_csv, is_cancelled
+from batch import run_batch, search_url
+from busca import main as busca_main
+from dedup import deduplicate
+
+# Job pipeline shared by the API's in-process threads (server.py) and the broker workers (worker.py).
+#
+# Every step reports through send_progress(stage, current, total, status="running", message="",
+# result=None, output_file=None) and publishes the job's terminal event itself.
+
+
+def finish_cancelled(send_progress, stage, current, total, output_file=None):
+    """Publishes the terminal "cancelled" event, pointing downloads at the partial file if any."""
+    if output_file and os.path.exists(output_file):
+        send_progress(stage, current, total, "cancelled",
+                      "Busca cancelada. Resultados parciais disponíveis para download.", output_file=output_file)
+    else:
+        send_progress(stage, current, total, "cancelled", "Busca cancelada antes de qualquer resultado.")
+
+
+def run_stage1(termo, cidade, stage1_file, send_progress, cancel_event=None, on_places=None):
+    """Scrapes Google Maps, deduplicates and writes `stage1_file`.
+
+    Returns the number of businesses left for stage 2, or None if the job
+    already ended here (nothing found or cancelled).
+    """
+    send_progress(1, 0, 0, "running", "Iniciando busca no Google Maps...")
+
+    scraped = []
+
+    def stage1_callback(current, total, result=None):
+        if result is not None:
+            scraped.append(result)
+        send_progress(1, current, total, "running", f"Extraindo empresa {current}/{total}", result=result)
+
+    try:
+        scraped_data = scrape_google_maps(search_url(termo, cidade), progress_callback=stage1_callback,
+                                          cancel_event=cancel_event)
+    except Exception:
+        if not is_cancelled(cancel_event):
+            raise
+        scraped_data = scraped
+
+    if is_cancelled(cancel_event):
+        save_to_csv(scraped_data, filename=stage1_file)
+        finish_cancelled(send_progress, 1, len(scraped_data), len(scraped_data),
+                         stage1_file if scraped_data else None)
+        return None
+
+    if not scraped_data:
+        send_progress(1, 0, 0, "error", "Nenhum dado encontrado no Google Maps.")
+        return None
+
+    # Merge repeated listings so no website is fetched twice in stage 2
+    scraped_count = len(scraped_data)
+    scraped_data = deduplicate(scraped_data)
+    removed = scraped_count - len(scraped_data)
+
+    save_to_csv(scraped_data, filename=stage1_file)
+    if on_places:
+        on_places(scraped_data)
+    message = "Etapa 1 concluída."
+    if removed:
+        message += f" {removed} duplicada(s) removida(s)."
+    send_progress(1, scraped_count, scraped_count, "running", message)
+    return len(scraped_data)
+
+
+def run_stage2(stage1_file, stage2_file, total, send_progress, cancel_event=None):
+    """Extracts contacts for the stage-1 businesses into `stage2_file`."""
+    send_progress(2, 0, total, "running", "Iniciando extração de contatos...")
+
+    def stage2_callback(current, total):
+        send_progress(2, current, total, "running", f"Processando contatos {current}/{total}")
+
+    busca_main(input_file=stage1_file, output_file=stage2_file, progress_callback=stage2_callback,
+               cancel_event=cancel_event)
+
+    if is_cancelled(cancel_event):
+        finish_cancelled(send_progress, 2, total, total, stage2_file)
+        return
+
+    send_progress(2, total, total, "completed", "Busca finalizada com sucesso!", output_file=stage2_file)
+
+
+def run_batch_stage(queries, output_file, send_progress, cancel_event=None, on_places=None):
+    """Runs a batch of (termo, cidade) queries into `output_file` (see batch.run_batch)."""
+    progress = {"stage": 1, "current": 0, "total": len(queries), "message": ""}
+    send_progress(1, 0, len(queries), "running", f"Iniciando lote com {len(queries)} consultas...")
+
+    def batch_progress(stage, current, total, message):
+        progress.update(stage=stage, current=current, total=total, message=message)
+        send_progress(stage, current, total, "running", message)
+
+    def batch_result(result):
+        send_progress(progress["stage"], progress["current"], progress["total"], "running", progress["message"],
+                      result=result)
+
+    summary = run_batch(queries, output_file, progress_callback=batch_progress, result_callback=batch_result,
+                        cancel_event=cancel_event)
+
+    if on_places and summary.get("places"):
+        on_places(summary["places"])
+
+    if summary["cancelled"]:
+        finish_cancelled(send_progress, progress["stage"], progress["current"], progress["total"],
+                         output_file if summary["businesses"] else None)
+        return
+
+    if not summary["businesses"]:
+        send_progress(1, 0, 0, "error", "Nenhum dado encontrado no Google Maps.")
+        return
+
+    message = f"Lote finalizado: {summary['businesses']} empresas únicas em {summary['queries']} consultas."
+    if summary["errors"]:
+        message += f" {len(summary['errors'])} consulta(s) falharam."
+    send_progress(2, summary["businesses"], summary["businesses"], "completed", message, output_file=output_file)
@@ -1,30 +1,66 @@
 import json
 import os
 import re
+import secrets
 import threading
+import time
 import uuid
+from collections import Counter, OrderedDict, defaultdict
 from datetime import datetime, timedelta, timezone
 from functools import wraps
-from queue import Queue, Empty
-from urllib.parse import quote
 
 import jwt
-from flask import Flask, request, jsonify, Response, send_file
+from flask import Flask, request, jsonify, Response, send_file, g
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
 
-from app import scrape_google_maps, save_to_csv
-from busca import main as busca_main
+from broker import open_broker
+from events import EventBroadcaster
+from spatial import PlaceIndex
+from storage import search_files, batch_file, write_results_csv
+
+# The scraping engine (pipeline -> app/busca/batch: Selenium, pandas, requests, BeautifulSoup) is
+# imported by the job runners on first use, so auth and progress endpoints start fast and stay small.
+# With JOB_BROKER_URL set it is never loaded here: it lives in the worker.py processes.
 
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*", "methods": ["GET", "POST", "OPTIONS"]}})
 
 JWT_SECRET = os.environ.get("JWT_SECRET", "change-this-secret-in-production")
 JWT_EXPIRY_HOURS = 24
+TOKEN_CACHE_SIZE = 1024
+STREAM_TICKET_TTL_SECONDS = 15 * 60
+PROGRESS_MAX_EVENTS_PER_SECOND = 4
+PROGRESS_REPLAY_BUFFER = 1000
+MAX_BATCH_QUERIES = 100
+MAX_PLACES_RESULTS = 5000
+
+# Column order of the compact result rows streamed in progress events
+RESULT_COLUMNS = ["Name", "Full Address", "EMAIL", "URL", "lat", "lng"]
 USERS_FILE = os.path.join(os.path.dirname(__file__), "users.json")
-
-# Store job state: { job_id: { "status", "stage", "current", "total", "message", "output_file", "queue" } }
+TEMP_DIR = os.path.join(os.path.dirname(__file__), "TEMP")
+PLACES_FILE = os.path.join(os.path.dirname(__file__), "places.jsonl")
+# With JOB_BROKER_URL set, jobs run in worker.py processes and outputs go to shared STORAGE_DIR
+JOB_BROKER_URL = os.environ.get("JOB_BROKER_URL", "")
+STORAGE_DIR = os.environ.get("STORAGE_DIR", TEMP_DIR)
+BROKER_POLL_SECONDS = 0.5
+
+# Store job state: { job_id: { "status", "stage", "current", "total", "message", "output_file", "events", "results", "lock", "cancel" } }
 jobs = {}
+_jobs_lock = threading.Lock()
+
+# Verified JWTs: { token: (username, exp_timestamp) }, kept in LRU order
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+# Job-scoped stream tickets: { ticket: (job_id, expires_at) }
+stream_tickets = {}
+_stream_tickets_lock = threading.Lock()
+
+# Every scraped place with coordinates, across all jobs (loaded on first use)
+place_index = PlaceIndex(PLACES_FILE, history_dir=TEMP_DIR)
+
+broker = open_broker(JOB_BROKER_URL) if JOB_BROKER_URL else None
 
 
 # ---------- User storage helpers ----------
@@ -51,28 +87,106 @@ def create_token(username):
     return jwt.encode(payload, JWT_SECRET, algorithm="HS256")
 
 
+def verify_token(token):
+    """Returns the username for a valid token, using the verified-token cache.
+
+    Raises jwt.ExpiredSignatureError / jwt.InvalidTokenError like jwt.decode.
+    """
+    now = time.time()
+    with _token_cache_lock:
+        cached = _token_cache.get(token)
+        if cached is not None:
+            username, exp = cached
+            if exp > now:
+                _token_cache.move_to_end(token)
+                return username
+            # Token expired since it was cached: evict and let jwt.decode report it
+            del _token_cache[token]
+
+    payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+    username = payload.get("sub")
+    exp = payload.get("exp")
+    if exp is None:
+        # Tokens without expiry are never issued by create_token; don't cache them
+        return username
+
+    with _token_cache_lock:
+        _token_cache[token] = (username, float(exp))
+        _token_cache.move_to_end(token)
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return username
+
+
+def _bearer_token():
+    auth_header = request.headers.get("Authorization", "")
+    if auth_header.startswith("Bearer "):
+        return auth_header[len("Bearer "):]
+    return ""
+
+
+def _check_token(token):
+    """Returns an error response tuple for an invalid token, else None (and sets g.user)."""
+    if not token:
+        return jsonify({"error": "Token ausente ou inválido."}), 401
+    try:
+        g.user = verify_token(token)
+    except jwt.ExpiredSignatureError:
+        return jsonify({"error": "Token expirado."}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({"error": "Token inválido."}), 401
+    return None
+
+
 def require_auth(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        # Accept token from Authorization header or query param (for EventSource / window.open)
-        auth_header = request.headers.get("Authorization", "")
-        if auth_header.startswith("Bearer "):
-            token = auth_header[len("Bearer "):]
-        else:
-            token = request.args.get("token", "")
-
-        if not token:
-            return jsonify({"error": "Token ausente ou inválido."}), 401
-        try:
-            jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "Token expirado."}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Token inválido."}), 401
+        error = _check_token(_bearer_token())
+        if error:
+            return error
         return f(*args, **kwargs)
     return decorated
 
 
+# ---------- Stream tickets ----------
+
+def create_stream_ticket(job_id):
+    """Issues a short-lived opaque ticket that grants access to a single job's streams."""
+    now = time.time()
+    ticket = secrets.token_urlsafe(24)
+    with _stream_tickets_lock:
+        # Drop expired tickets so the table doesn't grow without bound
+        for key in [k for k, (_, exp) in stream_tickets.items() if exp <= now]:
+            del stream_tickets[key]
+        stream_tickets[ticket] = (job_id, now + STREAM_TICKET_TTL_SECONDS)
+    return ticket
+
+
+def check_stream_ticket(ticket, job_id):
+    with _stream_tickets_lock:
+        entry = stream_tickets.get(ticket)
+    if entry is None:
+        return False
+    ticket_job_id, exp = entry
+    return ticket_job_id == job_id and exp > time.time()
+
+
+def require_job_access(f):
+    """Like require_auth, but also accepts a job-scoped `?ticket=` (for EventSource / window.open)."""
+    @wraps(f)
+    def decorated(job_id, *args, **kwargs):
+        ticket = request.args.get("ticket", "")
+        if ticket:
+            if not check_stream_ticket(ticket, job_id):
+                return jsonify({"error": "Ticket inválido ou expirado."}), 401
+            return f(job_id, *args, **kwargs)
+        error = _check_token(_bearer_token())
+        if error:
+            return error
+        return f(job_id, *args, **kwargs)
+    return decorated
+
+
 # ---------- Auth endpoints ----------
 
 def _validate_password_strength(password):
@@ -151,59 +265,180 @@ def login():
 
 # ---------- Utilities ----------
 
-def sanitize_filename(name):
-    """Remove characters that are invalid in filenames."""
-    return re.sub(r'[<>:"/\\|?*]', '_', name).strip()
+def compact_row(result):
+    """Turns a scraped result dict into a list ordered by RESULT_COLUMNS."""
+    return [result.get(col) for col in RESULT_COLUMNS]
 
 
-def run_job(job_id, termo, cidade):
+def merge_progress(older, newer):
+    """Coalesces two progress events, keeping the result rows of both."""
+    if "rows" not in older:
+        return newer
+    if "rows" not in newer:
+        return {**newer, "row_start": older["row_start"], "rows": older["rows"]}
+    return {**newer, "row_start": older["row_start"], "rows": older["rows"] + newer["rows"]}
+
+
+def new_job(job_id=None):
+    """Registers a new job in `jobs` and returns its id."""
+    job_id = job_id or str(uuid.uuid4())
+    jobs[job_id] = {
+        "status": "running",
+        "stage": 1,
+        "current": 0,
+        "total": 0,
+        "message": "Iniciando...",
+        "output_file": None,
+        "events": EventBroadcaster(buffer_size=PROGRESS_REPLAY_BUFFER,
+                                   max_rate=PROGRESS_MAX_EVENTS_PER_SECOND, merge=merge_progress),
+        "results": [],
+        "lock": threading.Lock(),
+        "cancel": threading.Event(),
+    }
+    return job_id
+
+
+def progress_sender(job):
+    """Returns send_progress(stage, current, total, status, message, result, output_file) for a job.
+
+    A `result` dict is stored on the job and streamed as a compact row. Safe to
+    call from several threads.
+    """
+    def send_progress(stage, current, total, status="running", message="", result=None, output_file=None):
+        event = {"stage": stage, "current": current, "total": total, "status": status, "message": message}
+        with job["lock"]:
+            if output_file is not None:
+                # Set before the terminal event goes out, so a download right after it works
+                job["output_file"] = output_file
+            job.update(event)
+            if result is not None:
+                job["results"].append(result)
+                event["row_start"] = len(job["results"]) - 1
+                event["rows"] = [compact_row(result)]
+            # Running updates of the same stage are coalesced; terminal statuses are always delivered
+            job["events"].publish(event, coalesce_key=stage if status == "running" else None)
+    return send_progress
+
+
+def partial_results_file(job_id):
+    """Writes the results streamed so far to a CSV and returns its path (None if there are none)."""
+    results = list(jobs[job_id]["results"])
+    if not results:
+        return None
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    partial_file = os.path.join(TEMP_DIR, f"parcial_{job_id}.csv")
+    write_results_csv(results, partial_file, RESULT_COLUMNS)
+    return partial_file
+
+
+def _report_failure(job_id, send_progress, error):
     job = jobs[job_id]
-    queue = job["queue"]
+    if job["cancel"].is_set():
+        from pipeline import finish_cancelled
+
+        # The cancel interrupted a step: fall back to whatever rows were streamed
+        finish_cancelled(send_progress, job.get("stage", 1), job.get("current", 0), job.get("total", 0),
+                         partial_results_file(job_id))
+    else:
+        send_progress(job.get("stage", 1), 0, 0, "error", f"Erro: {str(error)}")
 
-    date_suffix = datetime.now().strftime("%m-%Y")
-    safe_termo = sanitize_filename(termo)
-    temp_dir = os.path.join(os.path.dirname(__file__), "TEMP")
-    os.makedirs(temp_dir, exist_ok=True)
-    stage1_file = os.path.join(temp_dir, f"{safe_termo}_{date_suffix}.csv")
-    stage2_file = os.path.join(temp_dir, f"busca_{safe_termo}_{date_suffix}.xlsx")
 
-    job["output_file"] = stage2_file
+def run_job(job_id, termo, cidade):
+    job = jobs[job_id]
+    send_progress = progress_sender(job)
+    stage1_file, stage2_file = search_files(termo, TEMP_DIR)
 
-    def send_progress(stage, current, total, status="running", message=""):
-        job.update({"stage": stage, "current": current, "total": total, "status": status, "message": message})
-        queue.put({"stage": stage, "current": current, "total": total, "status": status, "message": message})
+    def on_places(records):
+        place_index.add_places(records, job_id=job_id, query=f"{termo} em {cidade}")
 
     try:
-        # --- Stage 1: Google Maps scraping ---
-        send_progress(1, 0, 0, "running", "Iniciando busca no Google Maps...")
+        from pipeline import run_stage1, run_stage2
 
-        query = f"{termo} em {cidade}"
-        search_url = f"https://www.google.com/maps/search/{quote(query)}"
+        total = run_stage1(termo, cidade, stage1_file, send_progress, job["cancel"], on_places)
+        if total is not None:
+            run_stage2(stage1_file, stage2_file, total, send_progress, job["cancel"])
+    except Exception as e:
+        _report_failure(job_id, send_progress, e)
 
-        def stage1_callback(current, total, result=None):
-            send_progress(1, current, total, "running", f"Extraindo empresa {current}/{total}")
 
-        scraped_data = scrape_google_maps(search_url, progress_callback=stage1_callback)
+def run_batch_job(job_id, queries):
+    job = jobs[job_id]
+    send_progress = progress_sender(job)
 
-        if not scraped_data:
-            send_progress(1, 0, 0, "error", "Nenhum dado encontrado no Google Maps.")
-            return
+    def on_places(records):
+        place_index.add_places(records, job_id=job_id)
 
-        save_to_csv(scraped_data, filename=stage1_file)
-        send_progress(1, len(scraped_data), len(scraped_data), "running", "Etapa 1 concluída.")
+    try:
+        from pipeline import run_batch_stage
 
-        # --- Stage 2: Contact extraction ---
-        send_progress(2, 0, len(scraped_data), "running", "Iniciando extração de contatos...")
+        run_batch_stage(queries, batch_file(job_id, TEMP_DIR), send_progress, job["cancel"], on_places)
+    except Exception as e:
+        _report_failure(job_id, send_progress, e)
 
-        def stage2_callback(current, total):
-            send_progress(2, current, total, "running", f"Processando contatos {current}/{total}")
 
-        busca_main(input_file=stage1_file, output_file=stage2_file, progress_callback=stage2_callback)
+# ---------- Broker mode: jobs run in worker processes ----------
 
-        send_progress(2, len(scraped_data), len(scraped_data), "completed", "Busca finalizada com sucesso!")
+def relay_broker_events(job_id):
+    """Feeds a broker job's events into its local EventBroadcaster until the job ends.
 
-    except Exception as e:
-        send_progress(job.get("stage", 1), 0, 0, "error", f"Erro: {str(e)}")
+    Replays from the first event, so it also rebuilds jobs after an API restart.
+    """
+    job = jobs[job_id]
+    send_progress = progress_sender(job)
+    # Worker events carry their task's attempt. A retry streams its rows again, so per task we
+    # count how many rows with each name/address were shown and only show the ones beyond that.
+    latest_attempt = {}
+    shown_rows = defaultdict(Counter)
+    attempt_rows = defaultdict(Counter)
+    after_id = 0
+    while True:
+        batch_events = broker.events_after(job_id, after_id)
+        for after_id, event in batch_events:
+            task_id, attempt = event.get("task_id"), event.get("attempt")
+            if task_id is not None:
+                if attempt < latest_attempt.get(task_id, attempt):
+                    # A superseded attempt (its worker lost the lease) still publishing
+                    continue
+                if attempt > latest_attempt.get(task_id, attempt):
+                    attempt_rows[task_id] = Counter()
+                latest_attempt[task_id] = attempt
+            if "places" in event:
+                place_index.add_places(event["places"], job_id=job_id, query=event.get("query"))
+                continue
+            result = event.get("result")
+            if result is not None and task_id is not None:
+                key = (result.get("Name"), result.get("Full Address"))
+                attempt_rows[task_id][key] += 1
+                if attempt_rows[task_id][key] <= shown_rows[task_id][key]:
+                    result = None
+                else:
+                    shown_rows[task_id][key] += 1
+            send_progress(event["stage"], event["current"], event["total"], event["status"], event["message"],
+                          result=result, output_file=event.get("output_file"))
+            if event["status"] != "running":
+                return
+        if not batch_events:
+            time.sleep(BROKER_POLL_SECONDS)
+
+
+def start_broker_job(job_id, kind, task_kind, payload):
+    broker.create_job(job_id, kind)
+    broker.enqueue(job_id, task_kind, payload)
+    threading.Thread(target=relay_broker_events, args=(job_id,), daemon=True).start()
+
+
+def get_job(job_id):
+    """Returns the local job, attaching to the broker's copy if this process doesn't know it (e.g. after a restart)."""
+    job = jobs.get(job_id)
+    if job is not None or broker is None:
+        return job
+    if broker.get_job(job_id) is None:
+        return None
+    with _jobs_lock:
+        if job_id not in jobs:
+            new_job(job_id)
+            threading.Thread(target=relay_broker_events, args=(job_id,), daemon=True).start()
+    return jobs[job_id]
 
 
 # ---------- Protected API routes ----------
@@ -218,40 +453,153 @@ def start_search():
     if not termo or not cidade:
         return jsonify({"error": "Termo e cidade são obrigatórios."}), 400
 
-    job_id = str(uuid.uuid4())
-    jobs[job_id] = {
-        "status": "running",
-        "stage": 1,
-        "current": 0,
-        "total": 0,
-        "message": "Iniciando...",
-        "output_file": None,
-        "queue": Queue(),
-    }
+    job_id = new_job()
 
-    thread = threading.Thread(target=run_job, args=(job_id, termo, cidade), daemon=True)
-    thread.start()
+    if broker is not None:
+        stage1_file, stage2_file = search_files(termo, STORAGE_DIR)
+        start_broker_job(job_id, "search", "stage1", {
+            "termo": termo, "cidade": cidade, "stage1_file": stage1_file, "stage2_file": stage2_file,
+        })
+    else:
+        thread = threading.Thread(target=run_job, args=(job_id, termo, cidade), daemon=True)
+        thread.start()
 
     return jsonify({"job_id": job_id})
 
 
-@app.route("/api/progress/<job_id>")
+@app.route("/api/batch", methods=["POST"])
+@require_auth
+def start_batch():
+    """Accepts {"queries": [{"termo", "cidade"}, ...]} or {"termos": [...], "cidades": [...]} (all combinations)."""
+    data = request.get_json() or {}
+
+    if "queries" in data:
+        queries = [((q.get("termo") or "").strip(), (q.get("cidade") or "").strip())
+                   for q in data.get("queries") or [] if isinstance(q, dict)]
+    else:
+        termos = [t.strip() for t in data.get("termos") or [] if isinstance(t, str)]
+        cidades = [c.strip() for c in data.get("cidades") or [] if isinstance(c, str)]
+        queries = [(t, c) for t in termos for c in cidades]
+
+    # Drop repeated combinations, keeping the order they were given
+    queries = list(dict.fromkeys(queries))
+
+    if not queries or any(not termo or not cidade for termo, cidade in queries):
+        return jsonify({"error": "Informe ao menos uma consulta com termo e cidade."}), 400
+    if len(queries) > MAX_BATCH_QUERIES:
+        return jsonify({"error": f"Máximo de {MAX_BATCH_QUERIES} consultas por lote."}), 400
+
+    job_id = new_job()
+
+    if broker is not None:
+        start_broker_job(job_id, "batch", "batch", {
+            "queries": queries, "output_file": batch_file(job_id, STORAGE_DIR),
+        })
+    else:
+        thread = threading.Thread(target=run_batch_job, args=(job_id, queries), daemon=True)
+        thread.start()
+
+    return jsonify({"job_id": job_id, "queries": len(queries)})
+
+
+@app.route("/api/cancel/<job_id>", methods=["POST"])
+@require_auth
+def cancel(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job não encontrado."}), 404
+
+    if job["status"] != "running":
+        return jsonify({"error": "Job já finalizado."}), 409
+
+    # Cooperative: the job thread stops at its next checkpoint, closes Chrome and saves partial results
+    job["cancel"].set()
+    if broker is not None:
+        broker.cancel(job_id)
+    return jsonify({"status": "cancelling"}), 202
+
+
+def _float_args(*names):
+    """Parses required float query params; returns (values, error_response)."""
+    values = []
+    for name in names:
+        try:
+            value = float(request.args.get(name, ""))
+        except ValueError:
+            return None, (jsonify({"error": f"Parâmetro '{name}' inválido ou ausente."}), 400)
+        if value != value or value in (float("inf"), float("-inf")):
+            return None, (jsonify({"error": f"Parâmetro '{name}' inválido ou ausente."}), 400)
+        values.append(value)
+    return values, None
+
+
+def _places_limit():
+    limit = request.args.get("limit", "")
+    return min(int(limit), MAX_PLACES_RESULTS) if limit.isdigit() and int(limit) > 0 else MAX_PLACES_RESULTS
+
+
+@app.route("/api/places/nearby")
+@require_auth
+def places_nearby():
+    """Businesses from every job within `radius_km` of (`lat`, `lng`), nearest first."""
+    values, error = _float_args("lat", "lng", "radius_km")
+    if error:
+        return error
+    lat, lng, radius_km = values
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180) or radius_km <= 0:
+        return jsonify({"error": "Coordenadas ou raio fora dos limites."}), 400
+
+    places = place_index.within_radius(lat, lng, radius_km, limit=_places_limit())
+    return jsonify({"count": len(places), "places": places})
+
+
+@app.route("/api/places/bbox")
+@require_auth
+def places_bbox():
+    """Businesses from every job inside the box south/west/north/east."""
+    values, error = _float_args("south", "west", "north", "east")
+    if error:
+        return error
+    south, west, north, east = values
+    if south > north or west > east:
+        return jsonify({"error": "Caixa inválida: south <= north e west <= east."}), 400
+
+    places = place_index.within_bbox(south, west, north, east, limit=_places_limit())
+    return jsonify({"count": len(places), "places": places})
+
+
+@app.route("/api/stream-ticket/<job_id>", methods=["POST"])
 @require_auth
+def stream_ticket(job_id):
+    if get_job(job_id) is None:
+        return jsonify({"error": "Job não encontrado."}), 404
+    return jsonify({"ticket": create_stream_ticket(job_id), "expires_in": STREAM_TICKET_TTL_SECONDS})
+
+
+@app.route("/api/progress/<job_id>")
+@require_job_access
 def progress(job_id):
-    if job_id not in jobs:
+    job = get_job(job_id)
+    if job is None:
         return jsonify({"error": "Job não encontrado."}), 404
 
+    # EventSource resends Last-Event-ID on reconnect; the query param covers a fresh EventSource
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id", "")
+    if not last_event_id.isdigit():
+        last_event_id = None
+    # Result rows are opt-in so plain progress listeners stay small
+    with_rows = request.args.get("rows") == "1"
+
     def generate():
-        queue = jobs[job_id]["queue"]
-        while True:
-            try:
-                msg = queue.get(timeout=30)
-                yield f"data: {json.dumps(msg)}\n\n"
-                if msg.get("status") in ("completed", "error"):
-                    break
-            except Empty:
+        for item in job["events"].subscribe(last_event_id, timeout=30):
+            if item is None:
                 # Send keepalive
                 yield f"data: {json.dumps({'keepalive': True})}\n\n"
+                continue
+            event_id, msg = item
+            if not with_rows and "rows" in msg:
+                msg = {k: v for k, v in msg.items() if k not in ("rows", "row_start")}
+            yield f"id: {event_id}\ndata: {json.dumps(msg)}\n\n"
 
     return Response(generate(), mimetype="text/event-stream", headers={
         "Cache-Control": "no-cache",
@@ -259,14 +607,35 @@ def progress(job_id):
     })
 
 
+@app.route("/api/results/<job_id>")
+@require_job_access
+def results(job_id):
+    """Result rows extracted so far, from `offset` on (used to fill gaps in the live stream)."""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job não encontrado."}), 404
+
+    offset = request.args.get("offset", "0")
+    offset = int(offset) if offset.isdigit() else 0
+    rows = [compact_row(r) for r in job["results"][offset:]]
+    return jsonify({"columns": RESULT_COLUMNS, "row_start": offset, "rows": rows})
+
+
 @app.route("/api/download/<job_id>")
-@require_auth
+@require_job_access
 def download(job_id):
-    if job_id not in jobs:
+    job = get_job(job_id)
+    if job is None:
         return jsonify({"error": "Job não encontrado."}), 404
 
-    job = jobs[job_id]
-    if job["status"] != "completed":
+    if request.args.get("partial") == "1":
+        # Export whatever was scraped so far, even while the job is still running
+        partial_file = partial_results_file(job_id)
+        if not partial_file:
+            return jsonify({"error": "Nenhum resultado disponível ainda."}), 404
+        return send_file(partial_file, as_attachment=True, download_name=f"parcial_{job_id}.csv")
+
+    if job["status"] not in ("completed", "cancelled"):
         return jsonify({"error": "Job ainda não concluído."}), 400
 
     output_file = job["output_file"]
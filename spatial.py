@@ -0,0 +1,179 @@
+import csv
+import glob
+import json
+import math
+import os
+import threading
+from collections import defaultdict
+
+from text import normalize_text
+
+CELL_SIZE_DEGREES = 0.01  # ~1.1km grid cells
+EARTH_RADIUS_KM = 6371.0
+PLACE_FIELDS = ["Name", "Full Address", "EMAIL", "URL", "lat", "lng"]
+
+
+def _valid_coordinate(lat, lng):
+    try:
+        lat, lng = float(lat), float(lng)
+    except (TypeError, ValueError):
+        return False
+    return not (math.isnan(lat) or math.isnan(lng)) and -90 <= lat <= 90 and -180 <= lng <= 180
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+class PlaceIndex:
+    """Grid index of every scraped place, persisted as an append-only JSONL file.
+
+    The file is read on first use (or bootstrapped once from the stage-1 CSVs
+    in `history_dir`); afterwards add_places() updates both the file and the
+    in-memory grid, so queries never touch the disk. A place scraped again
+    (same normalized name and coordinates) replaces the older entry.
+    """
+
+    def __init__(self, path, history_dir=None, cell_size=CELL_SIZE_DEGREES):
+        self.path = path
+        self.history_dir = history_dir
+        self.cell_size = cell_size
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._places = {}  # place key -> place dict
+        self._cells = defaultdict(set)  # (row, col) -> place keys
+
+    # ---------- Loading / updating ----------
+
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self.cell_size), math.floor(lng / self.cell_size))
+
+    @staticmethod
+    def _key(place):
+        return (normalize_text(place.get("Name")), round(float(place["lat"]), 5), round(float(place["lng"]), 5))
+
+    def _insert(self, place):
+        key = self._key(place)
+        old = self._places.get(key)
+        if old is not None:
+            self._cells[self._cell(old["lat"], old["lng"])].discard(key)
+        self._places[key] = place
+        self._cells[self._cell(place["lat"], place["lng"])].add(key)
+
+    @staticmethod
+    def _to_place(record, job_id=None, query=None):
+        if not _valid_coordinate(record.get("lat"), record.get("lng")):
+            return None
+        place = {}
+        for field in PLACE_FIELDS:
+            value = record.get(field)
+            place[field] = None if isinstance(value, float) and math.isnan(value) else value
+        place["lat"], place["lng"] = float(place["lat"]), float(place["lng"])
+        place["job_id"] = job_id
+        place["query"] = record.get("query") or query
+        return place
+
+    def _history_places(self):
+        """Places from stage-1 CSVs written before the index file existed."""
+        places = []
+        for csv_file in sorted(glob.glob(os.path.join(self.history_dir or "", "*.csv"))):
+            try:
+                with open(csv_file, newline="", encoding="utf-8") as f:
+                    records = list(csv.DictReader(f))
+            except (OSError, UnicodeDecodeError, csv.Error):
+                continue
+            for record in records:
+                # Empty cells and "N/A" are missing values, as pandas reads them
+                record = {k: None if v in ("", "N/A") else v for k, v in record.items()}
+                place = self._to_place(record, query=os.path.basename(csv_file))
+                if place:
+                    places.append(place)
+        return places
+
+    def _ensure_loaded(self):
+        # Caller holds self._lock
+        if self._loaded:
+            return
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        self._insert(json.loads(line))
+        elif self.history_dir:
+            places = self._history_places()
+            self._write(places)
+            for place in places:
+                self._insert(place)
+        self._loaded = True
+
+    def _write(self, places):
+        if not places:
+            return
+        with open(self.path, "a") as f:
+            for place in places:
+                f.write(json.dumps(place, ensure_ascii=False) + "\n")
+
+    def add_places(self, records, job_id=None, query=None):
+        """Adds a finished job's records; records without coordinates are skipped.
+
+        Places already stored unchanged (e.g. a job's places relayed again) are
+        not written twice. Returns how many were added or updated.
+        """
+        places = [p for p in (self._to_place(r, job_id, query) for r in records) if p]
+        with self._lock:
+            # Load first so a brand-new file doesn't make us skip the history bootstrap
+            self._ensure_loaded()
+            places = [p for p in places if self._places.get(self._key(p)) != p]
+            self._write(places)
+            for place in places:
+                self._insert(place)
+        return len(places)
+
+    # ---------- Queries ----------
+
+    def _cells_in(self, south, west, north, east):
+        row_min, col_min = self._cell(south, west)
+        row_max, col_max = self._cell(north, east)
+        if (row_max - row_min + 1) * (col_max - col_min + 1) > len(self._cells):
+            # Huge area: walking the occupied cells is cheaper than enumerating the grid
+            for (row, col), keys in self._cells.items():
+                if row_min <= row <= row_max and col_min <= col <= col_max:
+                    yield from keys
+            return
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                yield from self._cells.get((row, col), ())
+
+    def within_radius(self, lat, lng, radius_km, limit=None):
+        """Places within `radius_km` of (lat, lng), nearest first, each with a `distance_km`."""
+        dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        # Longitude degrees shrink with latitude; clamp near the poles
+        dlng = math.degrees(radius_km / (EARTH_RADIUS_KM * max(math.cos(math.radians(lat)), 1e-6)))
+        with self._lock:
+            self._ensure_loaded()
+            found = []
+            for key in self._cells_in(lat - dlat, lng - dlng, lat + dlat, lng + dlng):
+                place = self._places[key]
+                distance = haversine_km(lat, lng, place["lat"], place["lng"])
+                if distance <= radius_km:
+                    found.append({**place, "distance_km": round(distance, 3)})
+        found.sort(key=lambda p: (p["distance_km"], p["Name"] or ""))
+        return found[:limit] if limit else found
+
+    def within_bbox(self, south, west, north, east, limit=None):
+        """Places inside the bounding box, ordered by name."""
+        with self._lock:
+            self._ensure_loaded()
+            found = [
+                self._places[key] for key in self._cells_in(south, west, north, east)
+                if south <= self._places[key]["lat"] <= north and west <= self._places[key]["lng"] <= east
+            ]
+        found.sort(key=lambda p: (p["Name"] or "", p["lat"], p["lng"]))
+        return found[:limit] if limit else found
+
+    def __len__(self):
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._places)
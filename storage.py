@@ -0,0 +1,38 @@
+import csv
+import os
+import re
+from datetime import datetime
+
+# Output file names under the storage dir. Kept free of the scraping stack so the API can name files
+# for broker tasks without importing it.
+
+
+def sanitize_filename(name):
+    """Remove characters that are invalid in filenames."""
+    return re.sub(r'[<>:"/\\|?*]', '_', name).strip()
+
+
+def search_files(termo, storage_dir):
+    """Stage-1 CSV and stage-2 XLSX paths for a search."""
+    date_suffix = datetime.now().strftime("%m-%Y")
+    safe_termo = sanitize_filename(termo)
+    os.makedirs(storage_dir, exist_ok=True)
+    return (
+        os.path.join(storage_dir, f"{safe_termo}_{date_suffix}.csv"),
+        os.path.join(storage_dir, f"busca_{safe_termo}_{date_suffix}.xlsx"),
+    )
+
+
+def batch_file(job_id, storage_dir):
+    date_suffix = datetime.now().strftime("%m-%Y")
+    os.makedirs(storage_dir, exist_ok=True)
+    return os.path.join(storage_dir, f"lote_{date_suffix}_{job_id[:8]}.xlsx")
+
+
+def write_results_csv(results, path, columns):
+    """Writes result dicts as a CSV: `columns` first, then any other keys, missing values left empty."""
+    fieldnames = list(dict.fromkeys([*columns, *(key for result in results for key in result)]))
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(results)
@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture
+def client():
+    import server
+    server.app.config['TESTING'] = True
+    with server.app.test_client() as client:
+        yield client
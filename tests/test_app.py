@@ -53,3 +53,44 @@ def test_save_to_csv_empty(capsys):
     # Assert
     captured = capsys.readouterr()
     assert "Nenhum dado para salvar." in captured.out
+
+def test_pause_returns_early_when_cancelled():
+    import threading
+    import time
+    from app import pause
+
+    cancel_event = threading.Event()
+    cancel_event.set()
+    start = time.monotonic()
+    assert pause(5, cancel_event) is True
+    assert time.monotonic() - start < 1
+
+
+def test_scrape_stops_before_building_a_half_loaded_row():
+    import threading
+    from unittest.mock import patch, MagicMock
+    from app import scrape_google_maps
+
+    element = MagicMock()
+    element.get_attribute.side_effect = lambda attr: "Você chegou ao final da lista" if attr == "innerHTML" else "Empresa"
+    driver = MagicMock()
+    driver.find_element.return_value = element
+    driver.find_elements.return_value = [element, element]
+    cancel_event = threading.Event()
+
+    def fake_pause(seconds, event=None):
+        # Cancelled while the details panel of the first business is loading
+        if seconds == 3:
+            cancel_event.set()
+            return True
+        return False
+
+    progress = MagicMock()
+    with patch("app.pause", side_effect=fake_pause), patch("app.WebDriverWait") as mock_wait:
+        results = scrape_google_maps("http://maps", progress_callback=progress, driver=driver,
+                                     cancel_event=cancel_event)
+
+    assert results == []
+    progress.assert_not_called()
+    # Only the initial page-load wait; no wait for a list that will never come back
+    assert mock_wait.return_value.until.call_count == 1
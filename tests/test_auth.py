@@ -1,13 +1,6 @@
 
 import pytest
 from unittest.mock import patch
-from server import app
-
-@pytest.fixture
-def client():
-    app.config['TESTING'] = True
-    with app.test_client() as client:
-        yield client
 
 @pytest.fixture
 def mock_users_store():
@@ -154,3 +147,97 @@ def test_protected_route_valid_token(client, mock_users_store):
         )
         assert response.status_code == 200
         assert 'job_id' in response.json
+
+def test_verify_token_uses_cache(mock_users_store):
+    import server
+    token = server.create_token('cache@example.com')
+    assert server.verify_token(token) == 'cache@example.com'
+
+    # Second verification must not re-run the signature check
+    with patch('server.jwt.decode') as mock_decode:
+        assert server.verify_token(token) == 'cache@example.com'
+        mock_decode.assert_not_called()
+
+def test_verify_token_cache_evicts_expired(mock_users_store):
+    import jwt
+    import server
+    token = server.create_token('expired@example.com')
+    server._token_cache[token] = ('expired@example.com', 0)
+
+    with pytest.raises(jwt.InvalidTokenError):
+        with patch('server.jwt.decode', side_effect=jwt.ExpiredSignatureError()):
+            server.verify_token(token)
+    assert token not in server._token_cache
+
+def test_verify_token_cache_is_bounded(mock_users_store):
+    import server
+    with patch('server.TOKEN_CACHE_SIZE', 2):
+        tokens = [server.create_token(f'user{i}@example.com') for i in range(3)]
+        for t in tokens:
+            server.verify_token(t)
+        assert tokens[0] not in server._token_cache
+        assert len(server._token_cache) <= 2
+
+def test_stream_ticket_grants_job_scoped_access(client, mock_users_store):
+    import server
+    token = server.create_token('ticket@example.com')
+    with patch('threading.Thread'):
+        job_id = client.post('/api/search',
+            json={'termo': 'test', 'cidade': 'city'},
+            headers={'Authorization': f'Bearer {token}'}
+        ).json['job_id']
+
+    response = client.post(f'/api/stream-ticket/{job_id}', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    ticket = response.json['ticket']
+
+    # Ticket works for its own job (job not completed yet)
+    response = client.get(f'/api/download/{job_id}?ticket={ticket}')
+    assert response.status_code == 400
+
+    # ...but not for another job, and the JWT is no longer accepted in the URL
+    server.jobs['other-job'] = dict(server.jobs[job_id])
+    assert client.get(f'/api/download/other-job?ticket={ticket}').status_code == 401
+    assert client.get(f'/api/download/{job_id}?token={token}').status_code == 401
+
+
+def test_server_import_does_not_load_scraping_stack(tmp_path):
+    import os
+    import subprocess
+    import sys
+
+    (tmp_path / "padaria_01-2026.csv").write_text(
+        "Name,Full Address,EMAIL,URL,lat,lng\nPadaria,Rua 1,N/A,N/A,-22.28,-42.53\n", encoding="utf-8")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = f"""
+import sys, server
+# Places queries (and places relayed from workers) must not load the engine either
+server.place_index = server.PlaceIndex({str(tmp_path / "places.jsonl")!r}, history_dir={str(tmp_path)!r})
+server.place_index.add_places([{{"Name": "Mercado", "lat": -22.281, "lng": -42.531}}])
+token = server.create_token("light@example.com")
+response = server.app.test_client().get("/api/places/nearby?lat=-22.28&lng=-42.53&radius_km=1",
+                                        headers={{"Authorization": "Bearer " + token}})
+assert response.json["count"] == 2, response.json
+
+# Broker mode: relaying a worker's rows and serving their partial download stays light too
+import time
+from broker import SQLiteBroker
+server.broker = SQLiteBroker({str(tmp_path / "broker.db")!r})
+server.TEMP_DIR = {str(tmp_path)!r}
+server.broker.create_job("job", "search")
+server.broker.publish("job", {{"stage": 1, "current": 1, "total": 2, "status": "running", "message": "",
+                               "result": {{"Name": "Padaria", "Full Address": "Rua 1", "lat": -22.28}}}})
+ticket = server.create_stream_ticket("job")
+server.get_job("job")
+deadline = time.time() + 5
+while not server.jobs["job"]["results"] and time.time() < deadline:
+    time.sleep(0.05)
+with server.app.test_client().get("/api/download/job?ticket=" + ticket + "&partial=1") as response:
+    assert response.status_code == 200, response.status_code
+    assert response.data.decode().splitlines()[:2] == ["Name,Full Address,EMAIL,URL,lat,lng",
+                                                        "Padaria,Rua 1,,,-22.28,"], response.data
+print(sorted(m for m in ("selenium", "pandas", "numpy", "requests", "bs4") if m in sys.modules))
+"""
+    output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True)
+    assert output.returncode == 0, output.stderr
+    assert output.stdout.strip() == "[]"
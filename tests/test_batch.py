@@ -0,0 +1,202 @@
+import time
+from unittest.mock import patch, MagicMock
+
+import pandas as pd
+import pytest
+
+import batch
+
+
+def business(name, address="Rua A", url="N/A"):
+    return {"Name": name, "Full Address": address, "EMAIL": "N/A", "URL": url, "lat": None, "lng": None}
+
+
+SCRAPED = {
+    "confecções em Nova Friburgo": [business("Malharia X", url="http://x.com"), business("Loja Y")],
+    "malharia em Nova Friburgo": [business("Malharia  X", url="http://x.com"), business("Fábrica Z", url="http://z.com")],
+}
+
+
+def fake_scrape(url, progress_callback=None, driver=None, cancel_event=None):
+    for label, results in SCRAPED.items():
+        if url == batch.search_url(*label.split(" em ")):
+            for i, r in enumerate(results):
+                progress_callback(i + 1, len(results), r)
+            return results
+    raise RuntimeError("timeout")
+
+
+def test_run_batch_shares_drivers_and_dedupes(tmp_path):
+    queries = [("confecções", "Nova Friburgo"), ("malharia", "Nova Friburgo"), ("vazio", "Lugar")]
+    output = tmp_path / "lote.xlsx"
+    streamed = []
+
+    with patch("batch.create_driver", side_effect=lambda: MagicMock()) as mock_driver, \
+         patch("batch.scrape_google_maps", side_effect=fake_scrape), \
+         patch("batch.fetch_contacts", return_value=("a@x.com", "N/A", "N/A")) as mock_fetch:
+        summary = batch.run_batch(queries, str(output), result_callback=streamed.append, sessions=1)
+
+    # One browser for the whole batch, plus one replacement after the failing query
+    assert mock_driver.call_count <= 2
+    # Malharia X appears in two queries but its website is fetched once
+    assert sorted(call.args[0] for call in mock_fetch.call_args_list) == ["http://x.com", "http://z.com"]
+    assert summary["businesses"] == 3
+    assert len(streamed) == 3
+    assert list(summary["errors"]) == [2]
+
+    sheets = pd.read_excel(output, sheet_name=None)
+    consolidated = sheets["Consolidado"]
+    assert len(consolidated) == 3
+    row = consolidated[consolidated["Name"] == "Malharia X"].iloc[0]
+    assert row["Consultas"] == "confecções em Nova Friburgo | malharia em Nova Friburgo"
+    assert len(sheets) == 4
+    assert len(sheets["2 malharia em Nova Friburgo"]) == 2
+
+
+def test_streamed_rows_match_consolidated_sheet(tmp_path):
+    # Same business listed slightly differently by two queries: fuzzy-merged in the workbook, streamed once
+    SCRAPED_FUZZY = {
+        "confecções em Nova Friburgo": [dict(business("Malharia Silva Ltda", url="http://silva.com.br"),
+                                             lat=-22.2821, lng=-42.5312)],
+        "malharia em Nova Friburgo": [dict(business("Malharia Silva", url="https://www.silva.com.br/"),
+                                           lat=-22.2822, lng=-42.5313)],
+    }
+
+    def scrape_and_stream(url, progress_callback=None, driver=None, cancel_event=None):
+        for label, results in SCRAPED_FUZZY.items():
+            if url == batch.search_url(*label.split(" em ")):
+                for i, r in enumerate(results):
+                    progress_callback(i + 1, len(results), r)
+                return results
+        return []
+
+    queries = [("confecções", "Nova Friburgo"), ("malharia", "Nova Friburgo")]
+    streamed = []
+    with patch("batch.create_driver", side_effect=lambda: MagicMock()), \
+         patch("batch.scrape_google_maps", side_effect=scrape_and_stream), \
+         patch("batch.fetch_contacts", return_value=("N/A", "N/A", "N/A")):
+        summary = batch.run_batch(queries, str(tmp_path / "lote.xlsx"), result_callback=streamed.append, sessions=1)
+
+    assert summary["businesses"] == 1
+    assert len(streamed) == 1
+
+
+def test_sheet_names_are_valid_and_unique():
+    used = set()
+    long_label = "x" * 40 + " em Rio/RJ"
+    first = batch._sheet_name(0, long_label, used)
+    second = batch._sheet_name(0, long_label, used)
+    assert len(first) <= 31 and len(second) <= 31
+    assert "/" not in first
+    assert first != second
+
+
+def test_batch_endpoint_expands_combinations(client):
+    import server
+    token = server.create_token('batch@example.com')
+    headers = {'Authorization': f'Bearer {token}'}
+
+    with patch('threading.Thread') as mock_thread:
+        response = client.post('/api/batch', headers=headers,
+                               json={'termos': ['confecções', 'malharia'], 'cidades': ['Nova Friburgo', 'Petrópolis']})
+    assert response.status_code == 200
+    assert response.json['queries'] == 4
+    assert len(mock_thread.call_args.kwargs['args'][1]) == 4
+
+    response = client.post('/api/batch', headers=headers, json={'queries': [{'termo': 'x', 'cidade': ''}]})
+    assert response.status_code == 400
+
+    with patch('server.MAX_BATCH_QUERIES', 1):
+        response = client.post('/api/batch', headers=headers,
+                               json={'termos': ['a', 'b'], 'cidades': ['c']})
+    assert response.status_code == 400
+
+
+def test_enrich_businesses_drops_pending_fetches_on_cancel():
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    businesses = {("b", str(i)): {"record": business("b", str(i), url=f"http://{i}.com"), "queries": []}
+                  for i in range(20)}
+    cancel_event = threading.Event()
+
+    release = threading.Event()
+
+    def slow_fetch(url, name, cancel_event=None):
+        if url == "http://0.com":
+            return ("x@y.com", "N/A", "N/A")
+        # Cancelled while this download is in flight; it outlives enrich_businesses
+        cancel_event.set()
+        release.wait(5)
+        return ("late@y.com", "N/A", "N/A")
+
+    executor = ThreadPoolExecutor(max_workers=2)
+    with patch("batch.fetch_contacts", side_effect=slow_fetch) as mock_fetch:
+        started = time.monotonic()
+        rows = batch.enrich_businesses(businesses, executor, cancel_event=cancel_event)
+        elapsed = time.monotonic() - started
+        release.set()
+        executor.shutdown()
+
+    assert elapsed < 2
+    assert mock_fetch.call_count < 20
+    assert not any(row["Email"] == "late@y.com" for row in rows.values())
+    assert len(rows) == 20
+    assert sum(row["Email"] == "N/A" for row in rows.values()) >= 20 - mock_fetch.call_count
+
+
+def test_cancel_endpoint_saves_partial_results(client, tmp_path):
+    import threading
+    import server
+
+    token = server.create_token('cancel@example.com')
+    headers = {'Authorization': f'Bearer {token}'}
+    job_id = server.new_job()
+    scraping = threading.Event()
+
+    def fake_scrape(url, progress_callback=None, cancel_event=None):
+        progress_callback(1, 3, business("Primeira"))
+        scraping.set()
+        cancel_event.wait(5)
+        return [business("Primeira")]
+
+    with patch("pipeline.scrape_google_maps", side_effect=fake_scrape), \
+         patch("pipeline.busca_main") as mock_busca, \
+         patch("server.TEMP_DIR", str(tmp_path)):
+        worker = threading.Thread(target=server.run_job, args=(job_id, "termo", "cidade"))
+        worker.start()
+        scraping.wait(5)
+        assert client.post(f'/api/cancel/{job_id}', headers=headers).status_code == 202
+        worker.join(5)
+
+        mock_busca.assert_not_called()
+        assert server.jobs[job_id]["status"] == "cancelled"
+        with client.get(f'/api/download/{job_id}', headers=headers) as response:
+            assert response.status_code == 200
+            assert b"Primeira" in response.data
+
+    assert client.post(f'/api/cancel/{job_id}', headers=headers).status_code == 409
+
+
+def test_browser_start_failures_are_reported():
+    queries = [("confecções", "Nova Friburgo"), ("malharia", "Nova Friburgo")]
+
+    with patch("batch.create_driver", side_effect=RuntimeError("chrome not found")):
+        with pytest.raises(RuntimeError, match="chrome not found"):
+            batch.scrape_queries(queries, sessions=2)
+
+    # One failed start: that query is recorded as an error, the next one gets a new browser
+    drivers = iter([RuntimeError("chrome crashed"), MagicMock()])
+
+    def flaky_driver():
+        driver = next(drivers)
+        if isinstance(driver, Exception):
+            raise driver
+        return driver
+
+    with patch("batch.create_driver", side_effect=flaky_driver), \
+         patch("batch.scrape_google_maps", side_effect=fake_scrape):
+        results, errors = batch.scrape_queries(queries, sessions=1)
+
+    assert errors == {0: "chrome crashed"}
+    assert len(results[1]) == 2
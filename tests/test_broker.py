@@ -0,0 +1,241 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from broker import JobBroker, SQLiteBroker, open_broker
+import worker
+
+
+@pytest.fixture
+def broker(tmp_path):
+    return SQLiteBroker(str(tmp_path / "broker.db"))
+
+
+def test_each_task_is_claimed_once(broker):
+    broker.create_job("job", "search")
+    for i in range(20):
+        broker.enqueue("job", "stage1", {"i": i})
+
+    claimed = []
+
+    def claim_all(worker_id):
+        while True:
+            task = broker.claim(worker_id, ("stage1",))
+            if task is None:
+                return
+            claimed.append(task["payload"]["i"])
+
+    threads = [threading.Thread(target=claim_all, args=(f"w{n}",)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(claimed) == list(range(20))
+
+
+def test_expired_lease_is_reclaimed_and_cancel_drops_queued(broker):
+    broker.create_job("job", "search")
+    broker.enqueue("job", "stage1", {})
+    first = broker.claim("w1", ("stage1",), lease_seconds=-1)
+    # The first worker "crashed": its lease is already over
+    second = broker.claim("w2", ("stage1",))
+    assert second["task_id"] == first["task_id"]
+    assert second["attempts"] == 2
+    assert broker.claim("w3", ("stage1",)) is None
+
+    broker.enqueue("job", "stage2", {})
+    broker.cancel("job")
+    assert broker.is_cancelled("job")
+    assert broker.claim("w1", ("stage2",)) is None
+
+
+def test_open_broker_rejects_unknown_scheme(tmp_path):
+    assert isinstance(open_broker(f"sqlite:///{tmp_path}/b.db"), SQLiteBroker)
+    with pytest.raises(ValueError):
+        open_broker("amqp://localhost")
+
+
+def test_incomplete_backend_fails_at_construction():
+    class HalfBroker(JobBroker):
+        def create_job(self, job_id, kind):
+            pass
+
+    with patch.dict("broker.BROKER_BACKENDS", {"half": lambda url: HalfBroker()}):
+        with pytest.raises(TypeError):
+            open_broker("half://localhost")
+
+
+RESULTS = [{"Name": f"Empresa {i}", "Full Address": f"Rua {i}", "EMAIL": "N/A", "URL": "N/A",
+            "lat": -22.0 - i * 0.01, "lng": -42.0} for i in range(3)]
+
+
+def fake_scrape(url, progress_callback=None, cancel_event=None):
+    for i, r in enumerate(RESULTS):
+        progress_callback(i + 1, len(RESULTS), r)
+    return RESULTS
+
+
+def fake_busca(input_file, output_file, progress_callback=None, cancel_event=None):
+    progress_callback(len(RESULTS), len(RESULTS))
+    open(output_file, "wb").close()
+
+
+def test_worker_runs_stage1_then_stage2(broker, tmp_path):
+    broker.create_job("job", "search")
+    broker.enqueue("job", "stage1", {"termo": "padaria", "cidade": "Niterói",
+                                     "stage1_file": str(tmp_path / "s1.csv"),
+                                     "stage2_file": str(tmp_path / "s2.xlsx")})
+
+    with patch("pipeline.scrape_google_maps", side_effect=fake_scrape), \
+         patch("pipeline.busca_main", side_effect=fake_busca):
+        worker.run_worker(broker, max_tasks=2)
+
+    events = [event for _, event in broker.events_after("job")]
+    assert [e["places"] for e in events if "places" in e] == [RESULTS]
+    assert events[-1]["status"] == "completed"
+    assert events[-1]["output_file"] == str(tmp_path / "s2.xlsx")
+    assert broker.get_job("job")["status"] == "completed"
+    assert broker.claim("w", worker.TASK_KINDS) is None
+
+
+def test_worker_reports_task_errors(broker):
+    broker.create_job("job", "batch")
+    broker.enqueue("job", "unknown", {})
+
+    worker.run_worker(broker, kinds=("unknown",), max_tasks=1)
+
+    assert broker.get_job("job")["status"] == "error"
+    assert broker.events_after("job")[-1][1]["status"] == "error"
+
+
+def test_server_relays_worker_events(broker, tmp_path):
+    import server
+
+    with patch("server.broker", broker), \
+         patch("server.STORAGE_DIR", str(tmp_path)), \
+         patch("server.place_index", server.PlaceIndex(str(tmp_path / "places.jsonl"))), \
+         patch("pipeline.scrape_google_maps", side_effect=fake_scrape), \
+         patch("pipeline.busca_main", side_effect=fake_busca), \
+         server.app.test_client() as client:
+        token = server.create_token("worker@example.com")
+        response = client.post("/api/search", json={"termo": "padaria", "cidade": "Niterói"},
+                               headers={"Authorization": f"Bearer {token}"})
+        job_id = response.json["job_id"]
+        # Nothing runs in the API process: the task waits in the broker
+        assert broker.get_job(job_id)["status"] == "running"
+
+        worker.run_worker(broker, max_tasks=2)
+
+        deadline = time.time() + 5
+        while server.jobs[job_id]["status"] != "completed" and time.time() < deadline:
+            time.sleep(0.05)
+        assert server.jobs[job_id]["output_file"].startswith(str(tmp_path))
+
+        # A restarted API process attaches to the job through the broker
+        server.jobs.pop(job_id)
+        ticket = server.create_stream_ticket(job_id)
+        body = client.get(f"/api/progress/{job_id}?ticket={ticket}").get_data(as_text=True)
+        assert '"completed"' in body
+        with client.get(f"/api/download/{job_id}?ticket={ticket}") as response:
+            assert response.status_code == 200
+        assert len(server.place_index.within_radius(-22.0, -42.0, 10)) == 3
+
+
+def test_cancel_before_claim_finishes_job(broker):
+    broker.create_job("job", "search")
+    broker.enqueue("job", "stage1", {})
+    broker.cancel("job")
+
+    assert broker.claim("w", worker.TASK_KINDS) is None
+    assert broker.get_job("job")["status"] == "cancelled"
+    assert [event["status"] for _, event in broker.events_after("job")] == ["cancelled"]
+
+
+def test_cancel_between_stages_points_at_stage1_file(broker, tmp_path):
+    broker.create_job("job", "search")
+    broker.enqueue("job", "stage1", {"termo": "padaria", "cidade": "Niterói",
+                                     "stage1_file": str(tmp_path / "s1.csv"),
+                                     "stage2_file": str(tmp_path / "s2.xlsx")})
+    with patch("pipeline.scrape_google_maps", side_effect=fake_scrape):
+        worker.run_worker(broker, max_tasks=1)
+
+    # Stage 2 is queued, no worker holds it
+    broker.cancel("job")
+
+    last = broker.events_after("job")[-1][1]
+    assert last["status"] == "cancelled"
+    assert last["stage"] == 1 and last["current"] == len(RESULTS)
+    assert last["output_file"] == str(tmp_path / "s1.csv")
+    assert broker.claim("w", worker.TASK_KINDS) is None
+
+
+def test_task_out_of_attempts_fails_job(broker):
+    broker.create_job("job", "search")
+    broker.enqueue("job", "stage1", {})
+    for attempt in range(3):
+        assert broker.claim(f"w{attempt}", ("stage1",), lease_seconds=-1) is not None
+
+    assert broker.claim("w", ("stage1",)) is None
+    assert broker.get_job("job")["status"] == "error"
+    assert broker.events_after("job")[-1][1]["status"] == "error"
+
+
+def test_relay_skips_results_and_places_already_seen(broker, tmp_path):
+    import server
+
+    chain = {"Name": "Lojas Rede", "Full Address": "N/A", "lat": None, "lng": None}
+
+    def row(attempt, result):
+        broker.publish("job", {"stage": 1, "current": 1, "total": 1, "status": "running", "message": "",
+                               "result": result, "task_id": 7, "attempt": attempt})
+
+    broker.create_job("job", "search")
+    # Two branches whose details didn't load look alike, but both are shown
+    row(1, RESULTS[0])
+    row(1, chain)
+    row(1, chain)
+    # The first attempt died; the retry streams the same rows again, plus a third branch
+    row(2, RESULTS[0])
+    row(2, chain)
+    row(1, RESULTS[1])  # late event from the superseded attempt
+    row(2, chain)
+    row(2, chain)
+    broker.publish("job", {"places": RESULTS, "query": "padaria em Niterói", "task_id": 7, "attempt": 2})
+    broker.publish("job", {"stage": 1, "current": 1, "total": 1, "status": "error", "message": "Erro"})
+
+    places_file = tmp_path / "places.jsonl"
+    with patch("server.broker", broker), patch("server.place_index", server.PlaceIndex(str(places_file))):
+        for _ in range(2):
+            # The second relay is a re-attach (e.g. after an API restart) replaying every event
+            server.jobs.pop("job", None)
+            server.new_job("job")
+            server.relay_broker_events("job")
+            assert server.jobs["job"]["results"] == [RESULTS[0], chain, chain, chain]
+
+    assert len(places_file.read_text().splitlines()) == len(RESULTS)
+
+
+def test_worker_reports_interrupted_cancel_as_cancelled(broker, tmp_path):
+    stage1_file = tmp_path / "s1.csv"
+    stage1_file.write_text("Name\nEmpresa 0\n")
+    broker.create_job("job", "search")
+    broker.enqueue("job", "stage2", {"stage1_file": str(stage1_file), "stage2_file": str(tmp_path / "s2.xlsx"),
+                                     "total": 3})
+
+    def cancelled_busca(input_file, output_file, progress_callback=None, cancel_event=None):
+        progress_callback(1, 3)
+        broker.cancel("job")
+        cancel_event.set()
+        raise ConnectionError("interrupted")
+
+    with patch("pipeline.busca_main", side_effect=cancelled_busca):
+        worker.run_worker(broker, max_tasks=1)
+
+    last = broker.events_after("job")[-1][1]
+    assert last["status"] == "cancelled"
+    assert (last["stage"], last["current"]) == (2, 1)
+    assert last["output_file"] == str(stage1_file)
+    assert broker.get_job("job")["status"] == "cancelled"
@@ -60,3 +60,73 @@ def test_extract_contacts_empty():
     assert email == "N/A"
     assert phone == "N/A"
     assert socials == "N/A"
+
+def test_main_cancelled_keeps_remaining_rows_without_fetching(tmp_path):
+    import threading
+    from unittest.mock import patch
+    import pandas as pd
+    from busca import main
+
+    input_file = tmp_path / "input.csv"
+    output_file = tmp_path / "output.csv"
+    pd.DataFrame([
+        {"Name": "A", "Full Address": "Rua 1", "URL": "http://a.com"},
+        {"Name": "B", "Full Address": "Rua 2", "URL": "http://b.com"},
+    ]).to_csv(input_file, index=False)
+
+    cancel_event = threading.Event()
+    cancel_event.set()
+    with patch("busca.requests.get") as mock_get:
+        main(input_file=str(input_file), output_file=str(output_file), cancel_event=cancel_event)
+        mock_get.assert_not_called()
+
+    out = pd.read_csv(output_file, keep_default_na=False)
+    assert list(out["Name"]) == ["A", "B"]
+    assert list(out["Email"]) == ["N/A", "N/A"]
+
+
+def test_main_fetches_each_website_once(tmp_path):
+    from unittest.mock import patch
+    import pandas as pd
+    from busca import main
+
+    input_file = tmp_path / "input.csv"
+    output_file = tmp_path / "output.csv"
+    pd.DataFrame([
+        {"Name": "Loja Centro", "Full Address": "Rua 1", "URL": "http://loja.com"},
+        {"Name": "Loja Olaria", "Full Address": "Rua 2", "URL": "http://loja.com"},
+        {"Name": "Outra", "Full Address": "Rua 3", "URL": "http://outra.com"},
+    ]).to_csv(input_file, index=False)
+
+    with patch("busca.fetch_contacts", return_value=("contato@loja.com", "N/A", "N/A")) as mock_fetch:
+        main(input_file=str(input_file), output_file=str(output_file))
+
+    assert [call.args[0] for call in mock_fetch.call_args_list] == ["http://loja.com", "http://outra.com"]
+    out = pd.read_csv(output_file, keep_default_na=False)
+    assert list(out["Email"]) == ["contato@loja.com"] * 3
+
+
+def test_download_page_stops_when_cancelled_mid_response():
+    import threading
+    from unittest.mock import patch, MagicMock
+    from busca import download_page, fetch_contacts
+
+    cancel_event = threading.Event()
+
+    def chunks(size):
+        yield b"<html><body>contato@loja.com "
+        cancel_event.set()
+        yield b"mais conteudo"
+        raise AssertionError("kept reading after the cancel")
+
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.iter_content.side_effect = chunks
+    response.encoding = "utf-8"
+    with patch("busca.requests.get", return_value=response) as mock_get:
+        assert download_page("http://loja.com", cancel_event) is None
+        assert mock_get.call_args.kwargs["stream"] is True
+
+        cancel_event.clear()
+        response.iter_content.side_effect = lambda size: iter([b"<p>contato@loja.com</p>"])
+        assert fetch_contacts("http://loja.com", "Loja", cancel_event)[0] == "contato@loja.com"
@@ -0,0 +1,85 @@
+import pandas as pd
+
+from contacts import normalize_contacts, normalize_phones, normalize_emails, normalize_socials
+
+
+def test_phone_variants_collapse_to_one_e164_number():
+    df = pd.DataFrame({"Telefone": ["(22) 2522-1234 | 2225221234 | tel:+55 22 2522-1234 | 022 2522-1234"]})
+    out = normalize_contacts(df)
+    assert out.loc[0, "Telefone"] == "+552225221234"
+    assert out.loc[0, "WhatsApp"] == "N/A"
+
+
+def test_mobiles_are_flagged_for_whatsapp():
+    phones, is_mobile = normalize_phones(pd.Series(["(11) 98765-4321", "0 21 22 99876-5432", "(22) 2522-1234"]))
+    assert list(phones) == ["+5511987654321", "+5522998765432", "+552225221234"]
+    assert list(is_mobile) == [True, True, False]
+
+
+def test_invalid_phones_are_dropped():
+    phones, _ = normalize_phones(pd.Series(["0800123456", "2522-1234", "(20) 2522-1234", "(11) 1234-5678"]))
+    assert phones.isna().all()
+
+
+def test_junk_emails_are_filtered():
+    emails = normalize_emails(pd.Series([
+        "Contato@Loja.com.br",
+        "605a7baede844d278b89dc95ae0a9123@sentry.wixpress.com",
+        "abc@sentry.io",
+        "user@domain.com",
+        "noreply@loja.com.br",
+        "logo@2x.png",
+    ]))
+    assert list(emails.dropna()) == ["contato@loja.com.br"]
+
+
+def test_social_urls_are_canonicalized():
+    socials = normalize_socials(pd.Series([
+        "https://www.facebook.com/LojaX/",
+        "http://m.facebook.com/LojaX?ref=bookmarks",
+        "https://twitter.com/LojaX",
+        "https://www.instagram.com/LojaX/",
+        "https://www.facebook.com/sharer/sharer.php",
+        "https://twitter.com/intent/tweet",
+        "https://instagram.com",
+    ]))
+    assert list(socials[:4]) == [
+        "https://facebook.com/LojaX",
+        "https://facebook.com/LojaX",
+        "https://x.com/lojax",
+        "https://instagram.com/lojax",
+    ]
+    assert socials[4:].isna().all()
+
+
+def test_profiles_starting_like_non_profile_paths_are_kept():
+    socials = normalize_socials(pd.Series([
+        "https://www.instagram.com/tropicalmoda",
+        "https://www.instagram.com/trendy.store",
+        "https://www.facebook.com/homecenter",
+        "https://www.facebook.com/sharecafe",
+        "https://www.facebook.com/sharer.php",
+        "https://www.facebook.com/home",
+        "https://www.instagram.com/p/Cx1abc/",
+    ]))
+    assert list(socials[:4]) == [
+        "https://instagram.com/tropicalmoda",
+        "https://instagram.com/trendy.store",
+        "https://facebook.com/homecenter",
+        "https://facebook.com/sharecafe",
+    ]
+    assert socials[4:].isna().all()
+
+
+def test_normalize_contacts_dedupes_per_row_and_keeps_other_columns():
+    df = pd.DataFrame({
+        "Name": ["A", "B", "C"],
+        "Email": ["X@a.com | x@a.com", "N/A", None],
+        "Telefone": ["N/A", "(21) 99999-0000", None],
+        "Redes Sociais": ["https://facebook.com/a | https://www.facebook.com/a/", "N/A", None],
+    })
+    out = normalize_contacts(df)
+    assert list(out["Name"]) == ["A", "B", "C"]
+    assert list(out["Email"]) == ["x@a.com", "N/A", "N/A"]
+    assert list(out["WhatsApp"]) == ["N/A", "+5521999990000", "N/A"]
+    assert list(out["Redes Sociais"]) == ["https://facebook.com/a", "N/A", "N/A"]
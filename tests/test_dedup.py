@@ -0,0 +1,79 @@
+import random
+
+from dedup import deduplicate, cluster_records, geohash, website_domain, candidate_pairs
+
+
+def business(name, address="N/A", url="N/A", lat=None, lng=None, email="N/A"):
+    return {"Name": name, "Full Address": address, "EMAIL": email, "URL": url, "lat": lat, "lng": lng}
+
+
+def test_geohash_known_value():
+    assert geohash(57.64911, 10.40744, precision=11) == "u4pruydqqvj"
+    assert geohash(None, 10.0) is None
+
+
+def test_website_domain_ignores_social_profiles():
+    assert website_domain("https://www.Malharia.com.br/contato") == "malharia.com.br"
+    assert website_domain("https://instagram.com/malharia") is None
+    assert website_domain("N/A") is None
+
+
+def test_same_website_similar_name_is_merged():
+    records = [
+        business("Malharia Silva Ltda", url="http://malhariasilva.com.br", lat=-22.2821, lng=-42.5312),
+        business("Malharia Silva", url="https://www.malhariasilva.com.br/", email="contato@malhariasilva.com.br",
+                 lat=-22.2822, lng=-42.5313),
+        business("Padaria Central", url="http://padaria.com"),
+    ]
+    result = deduplicate(records)
+    assert [r["Name"] for r in result] == ["Malharia Silva", "Padaria Central"]
+    assert result[0]["EMAIL"] == "contato@malhariasilva.com.br"
+
+
+def test_chain_branches_sharing_a_website_are_kept():
+    records = [
+        business("Lojas Americanas - Centro", address="Rua Uruguaiana, 96 - Centro, Rio de Janeiro - RJ",
+                 url="https://www.americanas.com.br", lat=-22.9035, lng=-43.1790),
+        business("Lojas Americanas - Olaria", address="Rua Uranos, 1300 - Olaria, Rio de Janeiro - RJ",
+                 url="https://www.americanas.com.br", lat=-22.8460, lng=-43.2650),
+    ]
+    assert cluster_records(records) == [0, 1]
+
+
+def test_nearby_listing_with_similar_name_is_merged():
+    records = [
+        business("Confecções Aurora", lat=-22.28210, lng=-42.53120),
+        business("Confeccoes Aurora Moda", lat=-22.28215, lng=-42.53118),
+        business("Confecções Aurora", lat=-22.90000, lng=-43.20000),  # same name, another city
+    ]
+    assert cluster_records(records) == [0, 0, 2]
+
+
+def test_same_name_and_address_without_coordinates_is_merged():
+    records = [
+        business("Loja Bela Moda", address="Rua Augusto Spinelli, 100 - Centro, Nova Friburgo - RJ"),
+        business("Loja Bela Moda", address="R. Augusto Spinelli, 100 - Centro, Nova Friburgo - RJ"),
+        business("Loja Bela Moda", address="Av. Alberto Braune, 55 - Centro, Nova Friburgo - RJ"),
+    ]
+    assert cluster_records(records) == [0, 0, 2]
+
+
+def test_merge_is_deterministic_regardless_of_order():
+    records = [
+        business("Malharia Silva", url="http://malhariasilva.com.br", lat=-22.1, lng=-42.1),
+        business("Malharia Silva Ltda", url="http://malhariasilva.com.br"),
+        business("Padaria Central"),
+    ]
+    expected = sorted(map(lambda r: sorted(r.items(), key=str), deduplicate(records)), key=str)
+    for seed in range(5):
+        shuffled = records[:]
+        random.Random(seed).shuffle(shuffled)
+        result = sorted(map(lambda r: sorted(r.items(), key=str), deduplicate(shuffled)), key=str)
+        assert result == expected
+
+
+def test_blocking_avoids_comparing_unrelated_records():
+    records = [business(f"Empresa{i} Unica{i}", lat=-22 + i * 0.01, lng=-42 + i * 0.01) for i in range(300)]
+    left, right = candidate_pairs(records)
+    assert len(left) == 0
+    assert len(deduplicate(records)) == 300
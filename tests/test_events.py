@@ -0,0 +1,179 @@
+import threading
+import time
+
+from events import EventBroadcaster
+
+
+def collect(broadcaster, last_event_id=None):
+    return [item for item in broadcaster.subscribe(last_event_id, timeout=1) if item is not None]
+
+
+def test_terminal_event_always_delivered():
+    b = EventBroadcaster(max_rate=1)
+    b.publish({"status": "running", "current": 1}, coalesce_key=1)
+    b.publish({"status": "running", "current": 2}, coalesce_key=1)
+    b.publish({"status": "completed"})
+
+    events = [ev for _, ev in collect(b)]
+    # The second running update was coalesced into the pending slot, then flushed before the terminal one
+    assert events == [{"status": "running", "current": 1}, {"status": "running", "current": 2}, {"status": "completed"}]
+    assert b.closed
+
+
+def test_rapid_updates_are_coalesced():
+    b = EventBroadcaster(max_rate=2)
+    for i in range(1, 101):
+        b.publish({"status": "running", "current": i}, coalesce_key=1)
+    b.publish({"status": "completed"})
+
+    events = [ev for _, ev in collect(b)]
+    assert len(events) <= 3
+    assert events[-2]["current"] == 100
+    assert events[-1]["status"] == "completed"
+
+
+def test_unknown_last_event_id_replays_from_start():
+    # Ids from a broadcaster that was rebuilt (e.g. after an API restart) must not end the stream empty
+    b = EventBroadcaster(max_rate=0)
+    b.publish({"current": 1}, coalesce_key=1)
+    b.publish({"status": "completed"})
+
+    assert [ev for _, ev in collect(b, last_event_id="50")] == [{"current": 1}, {"status": "completed"}]
+    # A client already past the end gets the terminal event again instead of an empty stream
+    assert [ev for _, ev in collect(b, last_event_id="2")] == [{"status": "completed"}]
+
+
+def test_stage_change_is_not_coalesced():
+    b = EventBroadcaster(max_rate=1)
+    b.publish({"stage": 1, "current": 1}, coalesce_key=1)
+    b.publish({"stage": 1, "current": 10}, coalesce_key=1)
+    b.publish({"stage": 2, "current": 0}, coalesce_key=2)
+    b.publish({"status": "completed"})
+
+    events = [ev for _, ev in collect(b)]
+    assert {"stage": 1, "current": 10} in events
+    assert {"stage": 2, "current": 0} in events
+
+
+def test_pending_update_flushed_without_new_publish():
+    b = EventBroadcaster(max_rate=10)
+    b.publish({"current": 1}, coalesce_key=1)
+    b.publish({"current": 2}, coalesce_key=1)
+
+    gen = b.subscribe(timeout=1)
+    assert next(gen)[1] == {"current": 1}
+    # No further publish: the subscriber itself flushes the pending update after the interval
+    assert next(gen)[1] == {"current": 2}
+
+
+def test_multiple_subscribers_and_replay():
+    b = EventBroadcaster(max_rate=0)
+    received = [[], []]
+
+    def consume(idx):
+        received[idx].extend(collect(b))
+
+    threads = [threading.Thread(target=consume, args=(i,)) for i in range(2)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    for i in range(5):
+        b.publish({"current": i}, coalesce_key=1)
+    b.publish({"status": "completed"})
+    for t in threads:
+        t.join(timeout=2)
+
+    assert received[0] == received[1]
+    assert len(received[0]) == 6
+
+    # A reconnecting client only gets what came after its Last-Event-ID
+    replay = collect(b, last_event_id=str(received[0][2][0]))
+    assert replay == received[0][3:]
+
+
+def test_merge_combines_coalesced_events():
+    def merge(older, newer):
+        return {**newer, "rows": older["rows"] + newer["rows"]}
+
+    b = EventBroadcaster(max_rate=1, merge=merge)
+    b.publish({"rows": [1]}, coalesce_key=1)
+    b.publish({"rows": [2]}, coalesce_key=1)
+    b.publish({"rows": [3]}, coalesce_key=1)
+    b.publish({"status": "completed", "rows": []})
+
+    events = [ev for _, ev in collect(b)]
+    assert events[0]["rows"] == [1]
+    assert events[1]["rows"] == [2, 3]
+
+
+def test_progress_endpoint_replays_after_last_event_id():
+    import server
+
+    job_id = "replay-job"
+    b = EventBroadcaster(max_rate=0)
+    server.jobs[job_id] = {"status": "completed", "output_file": None, "events": b}
+    b.publish({"stage": 1, "current": 1}, coalesce_key=1)
+    b.publish({"stage": 1, "current": 2}, coalesce_key=1)
+    b.publish({"status": "completed"})
+
+    ticket = server.create_stream_ticket(job_id)
+    with server.app.test_client() as client:
+        body = client.get(f"/api/progress/{job_id}?ticket={ticket}",
+                          headers={"Last-Event-ID": "1"}).get_data(as_text=True)
+
+    assert body.startswith("id: 2\n")
+    assert '"current": 1' not in body
+    assert '"completed"' in body
+
+
+def test_progress_rows_are_opt_in_and_coalesced(tmp_path):
+    from unittest.mock import patch
+    import server
+
+    results = [{"Name": f"Empresa {i}", "Full Address": "Rua", "EMAIL": "N/A", "URL": "N/A", "lat": None, "lng": None}
+               for i in range(3)]
+
+    def fake_scrape(url, progress_callback=None, cancel_event=None):
+        for i, r in enumerate(results):
+            progress_callback(i + 1, len(results), r)
+        return results
+
+    job_id = server.new_job()
+    server.jobs[job_id]["events"] = EventBroadcaster(max_rate=1, merge=server.merge_progress)
+    with patch("pipeline.scrape_google_maps", side_effect=fake_scrape), \
+         patch("pipeline.busca_main"), \
+         patch("server.TEMP_DIR", str(tmp_path)):
+        server.run_job(job_id, "termo", "cidade")
+
+    events = [ev for _, ev in collect(server.jobs[job_id]["events"])]
+    streamed = []
+    for ev in events:
+        if "rows" in ev:
+            assert ev["row_start"] == len(streamed)
+            streamed.extend(ev["rows"])
+    assert streamed == [server.compact_row(r) for r in results]
+
+    ticket = server.create_stream_ticket(job_id)
+    with server.app.test_client() as client:
+        plain = client.get(f"/api/progress/{job_id}?ticket={ticket}").get_data(as_text=True)
+        assert '"rows"' not in plain
+
+        response = client.get(f"/api/results/{job_id}?ticket={ticket}&offset=1")
+        assert response.json["row_start"] == 1
+        assert [row[0] for row in response.json["rows"]] == ["Empresa 1", "Empresa 2"]
+
+
+def test_partial_download_while_running(tmp_path):
+    from unittest.mock import patch
+    import server
+
+    job_id = "partial-job"
+    server.jobs[job_id] = {"status": "running", "output_file": None, "events": EventBroadcaster(),
+                           "results": [{"Name": "Empresa", "URL": "N/A"}]}
+    ticket = server.create_stream_ticket(job_id)
+    with server.app.test_client() as client, \
+         patch("server.TEMP_DIR", str(tmp_path)):
+        assert client.get(f"/api/download/{job_id}?ticket={ticket}").status_code == 400
+        with client.get(f"/api/download/{job_id}?ticket={ticket}&partial=1") as response:
+            assert response.status_code == 200
+            assert b"Empresa" in response.data
@@ -0,0 +1,98 @@
+import json
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from spatial import PlaceIndex, haversine_km
+
+# Nova Friburgo centre and a few places around it
+CENTRO = (-22.2819, -42.5311)
+
+
+def place(name, lat, lng):
+    return {"Name": name, "Full Address": "N/A", "EMAIL": "N/A", "URL": "N/A", "lat": lat, "lng": lng}
+
+
+@pytest.fixture
+def index(tmp_path):
+    idx = PlaceIndex(str(tmp_path / "places.jsonl"))
+    idx.add_places([
+        place("Perto", -22.2830, -42.5320),        # ~150m
+        place("Olaria", -22.3000, -42.5500),       # ~2.8km
+        place("Petrópolis", -22.5050, -43.1780),   # ~70km
+        place("Sem coordenadas", None, None),
+    ], job_id="job-1", query="confecções em Nova Friburgo")
+    return idx
+
+
+def test_radius_query_sorted_by_distance(index):
+    places = index.within_radius(*CENTRO, radius_km=5)
+    assert [p["Name"] for p in places] == ["Perto", "Olaria"]
+    assert places[0]["distance_km"] < places[1]["distance_km"] <= 5
+    assert places[0]["job_id"] == "job-1"
+
+
+def test_radius_query_matches_brute_force(tmp_path):
+    import random
+    rng = random.Random(7)
+    records = [place(f"P{i}", -22 - rng.random(), -42 - rng.random()) for i in range(2000)]
+    idx = PlaceIndex(str(tmp_path / "places.jsonl"))
+    idx.add_places(records)
+
+    expected = {r["Name"] for r in records if haversine_km(*CENTRO, r["lat"], r["lng"]) <= 10}
+    assert {p["Name"] for p in idx.within_radius(*CENTRO, radius_km=10)} == expected
+
+
+def test_bbox_query_and_limit(index):
+    places = index.within_bbox(-22.31, -42.56, -22.27, -42.52)
+    assert [p["Name"] for p in places] == ["Olaria", "Perto"]
+    assert len(index.within_bbox(-90, -180, 90, 180, limit=1)) == 1
+
+
+def test_index_persists_and_skips_unchanged_places(index, tmp_path):
+    reloaded = PlaceIndex(str(tmp_path / "places.jsonl"))
+    assert not reloaded._loaded
+    reloaded.add_places([place("Nova", -22.2820, -42.5312)])
+    assert {p["Name"] for p in reloaded.within_radius(*CENTRO, radius_km=1)} == {"Perto", "Nova"}
+
+    lines = (tmp_path / "places.jsonl").read_text().splitlines()
+    assert reloaded.add_places([place("Nova", -22.2820, -42.5312)]) == 0
+    assert (tmp_path / "places.jsonl").read_text().splitlines() == lines
+
+
+def test_rescraped_place_replaces_older_entry(index):
+    index.add_places([place("Perto", -22.2830, -42.5320)], job_id="job-2")
+    assert len(index) == 3
+    assert index.within_radius(*CENTRO, radius_km=1)[0]["job_id"] == "job-2"
+
+
+def test_history_bootstrap_from_stage1_csvs(tmp_path):
+    history = tmp_path / "TEMP"
+    history.mkdir()
+    pd.DataFrame([place("Antiga", -22.2825, -42.5315)]).to_csv(history / "confecções_01-2026.csv", index=False)
+
+    idx = PlaceIndex(str(tmp_path / "places.jsonl"), history_dir=str(history))
+    assert [p["Name"] for p in idx.within_radius(*CENTRO, radius_km=1)] == ["Antiga"]
+    with open(tmp_path / "places.jsonl") as f:
+        assert json.loads(f.readline())["Name"] == "Antiga"
+
+
+def test_places_endpoints(index):
+    import server
+    server.app.config['TESTING'] = True
+    token = server.create_token('places@example.com')
+    headers = {'Authorization': f'Bearer {token}'}
+
+    with patch('server.place_index', index), server.app.test_client() as client:
+        response = client.get(f'/api/places/nearby?lat={CENTRO[0]}&lng={CENTRO[1]}&radius_km=5', headers=headers)
+        assert response.status_code == 200
+        assert response.json['count'] == 2
+
+        response = client.get('/api/places/bbox?south=-22.31&west=-42.56&north=-22.27&east=-42.52&limit=1',
+                              headers=headers)
+        assert response.json['count'] == 1
+
+        assert client.get('/api/places/nearby?lat=abc&lng=1&radius_km=5', headers=headers).status_code == 400
+        assert client.get('/api/places/bbox?south=1&west=0&north=0&east=1', headers=headers).status_code == 400
+        assert client.get('/api/places/nearby?lat=0&lng=0&radius_km=5').status_code == 401
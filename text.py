@@ -0,0 +1,19 @@
+import math
+import re
+import unicodedata
+
+# Text helpers shared by dedup and spatial. Standard library only, so the API can use them without the
+# scraping stack.
+
+
+def is_missing(value):
+    return value is None or value == "N/A" or (isinstance(value, float) and math.isnan(value))
+
+
+def normalize_text(value):
+    """Lowercase, accent-free, punctuation-free text."""
+    if is_missing(value):
+        return ""
+    text = unicodedata.normalize("NFKD", str(value))
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return re.sub(r"\s+", " ", re.sub(r"[^a-z0-9 ]", " ", text)).strip()
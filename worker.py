@@ -0,0 +1,150 @@
+import argparse
+import os
+import socket
+import threading
+import uuid
+
+from broker import open_broker, TASK_LEASE_SECONDS
+from pipeline import run_stage1, run_stage2, run_batch_stage, finish_cancelled
+
+# Scrape worker: pulls stage-1, stage-2 and batch tasks from the job broker
+# (JOB_BROKER_URL), reports progress back through it and writes outputs to
+# the shared STORAGE_DIR that the API serves downloads from. The SQLite broker
+# only supports workers on the API's host (see broker.SQLiteBroker).
+#
+#   JOB_BROKER_URL=sqlite:////srv/maps/broker.db STORAGE_DIR=/srv/maps/TEMP python worker.py
+
+TASK_KINDS = ("stage1", "stage2", "batch")
+POLL_SECONDS = 1.0
+WATCH_SECONDS = 2.0
+
+
+def task_tags(task):
+    """Fields added to a task's events, so the API can tell a retry's events from the earlier attempt's."""
+    return {"task_id": task["task_id"], "attempt": task["attempts"]} if task else {}
+
+
+def broker_progress_sender(broker, job_id, progress=None, task=None):
+    """send_progress() that publishes to the broker; terminal statuses also finish the job record.
+
+    If given, `progress` is kept updated with the last stage/current/total sent.
+    """
+    def send_progress(stage, current, total, status="running", message="", result=None, output_file=None):
+        event = {"stage": stage, "current": current, "total": total, "status": status, "message": message,
+                 **task_tags(task)}
+        if progress is not None:
+            progress.update(stage=stage, current=current, total=total)
+        if result is not None:
+            event["result"] = result
+        if output_file is not None:
+            event["output_file"] = output_file
+        if status != "running":
+            broker.update_job(job_id, status=status, output_file=output_file)
+        broker.publish(job_id, event)
+    return send_progress
+
+
+def watch_task(broker, task, cancel_event, done):
+    """Renews the task lease and mirrors the job's cancel flag until `done` is set."""
+    while not done.wait(WATCH_SECONDS):
+        broker.renew(task["task_id"], TASK_LEASE_SECONDS)
+        if broker.is_cancelled(task["job_id"]):
+            cancel_event.set()
+
+
+def partial_output(task):
+    """The most complete output a task left on disk, offered for download when it's cancelled."""
+    payload = task["payload"]
+    keys = ("stage2_file", "stage1_file") if task["kind"] == "stage2" else ("stage1_file", "output_file")
+    for key in keys:
+        if payload.get(key) and os.path.exists(payload[key]):
+            return payload[key]
+    return None
+
+
+def run_task(broker, task, cancel_event, progress=None):
+    job_id = task["job_id"]
+    payload = task["payload"]
+    send_progress = broker_progress_sender(broker, job_id, progress, task)
+    if broker.is_cancelled(job_id):
+        cancel_event.set()
+
+    def on_places(records, query=None):
+        broker.publish(job_id, {"places": records, "query": query, **task_tags(task)})
+
+    if task["kind"] == "stage1":
+        query = f"{payload['termo']} em {payload['cidade']}"
+        total = run_stage1(payload["termo"], payload["cidade"], payload["stage1_file"], send_progress, cancel_event,
+                           lambda records: on_places(records, query))
+        if total is not None:
+            # Stage 2 can be picked up by any worker; until it runs, the stage-1 CSV is the job's output
+            broker.update_job(job_id, output_file=payload["stage1_file"])
+            broker.enqueue(job_id, "stage2", {**payload, "total": total})
+    elif task["kind"] == "stage2":
+        run_stage2(payload["stage1_file"], payload["stage2_file"], payload["total"], send_progress, cancel_event)
+    elif task["kind"] == "batch":
+        queries = [tuple(q) for q in payload["queries"]]
+        run_batch_stage(queries, payload["output_file"], send_progress, cancel_event, on_places)
+    else:
+        raise ValueError(f"Tipo de tarefa desconhecido: {task['kind']}")
+
+
+def run_worker(broker, kinds=TASK_KINDS, worker_id=None, stop_event=None, max_tasks=None):
+    """Claims and runs tasks until `stop_event` is set (or `max_tasks` were run)."""
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    stop_event = stop_event or threading.Event()
+    done_tasks = 0
+
+    while not stop_event.is_set() and (max_tasks is None or done_tasks < max_tasks):
+        task = broker.claim(worker_id, kinds)
+        if task is None:
+            stop_event.wait(POLL_SECONDS)
+            continue
+
+        print(f"[{worker_id}] Tarefa {task['task_id']} ({task['kind']}) do job {task['job_id']}")
+        done = threading.Event()
+        cancel_event = threading.Event()
+        progress = {"stage": 2 if task["kind"] == "stage2" else 1, "current": 0, "total": 0}
+        cancel_watch = threading.Thread(target=watch_task, args=(broker, task, cancel_event, done), daemon=True)
+        try:
+            cancel_watch.start()
+            run_task(broker, task, cancel_event, progress)
+            broker.complete(task["task_id"])
+        except Exception as e:
+            send_progress = broker_progress_sender(broker, task["job_id"], task=task)
+            if cancel_event.is_set():
+                # The cancel interrupted a step: same outcome as server._report_failure in the API process
+                finish_cancelled(send_progress, progress["stage"], progress["current"], progress["total"],
+                                 partial_output(task))
+                broker.complete(task["task_id"])
+            else:
+                print(f"[{worker_id}] Erro na tarefa {task['task_id']}: {e}")
+                broker.fail(task["task_id"], e)
+                send_progress(progress["stage"], 0, 0, "error", f"Erro: {str(e)}")
+        finally:
+            done.set()
+        done_tasks += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker de scraping do Google Maps")
+    parser.add_argument("--broker", default=os.environ.get("JOB_BROKER_URL", ""),
+                        help="URL do broker (padrão: $JOB_BROKER_URL)")
+    parser.add_argument("--kinds", default=",".join(TASK_KINDS),
+                        help="Tipos de tarefa aceitos, separados por vírgula")
+    args = parser.parse_args()
+
+    if not args.broker:
+        parser.error("Informe --broker ou defina JOB_BROKER_URL.")
+
+    broker = open_broker(args.broker)
+    kinds = tuple(k.strip() for k in args.kinds.split(",") if k.strip())
+    print(f"Worker aguardando tarefas ({', '.join(kinds)})...")
+    try:
+        run_worker(broker, kinds)
+    except KeyboardInterrupt:
+        print("Worker encerrado.")
+
+
+if __name__ == "__main__":
+    main()